@@ -0,0 +1,13 @@
+"""Нагрузочные замеры страниц yatube.
+
+Запуск из каталога с manage.py::
+
+    python -m benchmarks --posts 10000 --output bench.json
+    python -m benchmarks --baseline bench.json
+    python -m benchmarks concurrency --threads 1 2 4 8
+    python -m benchmarks http --concurrency 1 8 32
+    python -m benchmarks render --renders 200
+
+Данные генерируются во временной тестовой базе, рабочая база
+не затрагивается.
+"""
@@ -0,0 +1,24 @@
+import os
+import sys
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+if sys.argv[1:2] == ['concurrency']:
+    from benchmarks.concurrency import main  # noqa: E402
+    sys.exit(main(sys.argv[2:]))
+
+if sys.argv[1:2] == ['http']:
+    from benchmarks.servers import main  # noqa: E402
+    sys.exit(main(sys.argv[2:]))
+
+if sys.argv[1:2] == ['render']:
+    from benchmarks.render import main  # noqa: E402
+    sys.exit(main(sys.argv[2:]))
+
+from benchmarks.cli import main  # noqa: E402
+
+sys.exit(main())
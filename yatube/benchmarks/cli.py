@@ -0,0 +1,140 @@
+import argparse
+import platform
+import random
+import sys
+
+import django
+from django.db import connection
+from django.test import Client, override_settings
+from django.utils import timezone
+
+from posts.models import Group, Post, User
+
+from .runner import compare, load, measure, sample_count, save
+from .scenarios import SCENARIOS, UNLIMITED_RATELIMITS, Dataset
+from .seed import seed
+
+COLUMNS = (
+    'p50_ms', 'p95_ms', 'p99_ms', 'queries_mean', 'queries_max',
+    'peak_memory_kb',
+)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description='Замер задержек, запросов к базе и памяти страниц.',
+    )
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--groups', type=int, default=20)
+    parser.add_argument('--posts', type=int, default=10000)
+    parser.add_argument('--comments', type=int, default=20000)
+    parser.add_argument(
+        '--requests', type=sample_count, default=200,
+        help='Запросов на сценарий.',
+    )
+    parser.add_argument(
+        '--memory-samples', type=int, default=10,
+        help='Запросов на сценарий под tracemalloc.',
+    )
+    parser.add_argument(
+        '--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS),
+    )
+    parser.add_argument(
+        '--cold', action='store_true',
+        help='Очищать кеши страниц и карточек перед каждым запросом.',
+    )
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Куда сохранить результаты (JSON).')
+    parser.add_argument(
+        '--baseline', help='Прошлые результаты для сравнения (JSON).',
+    )
+    parser.add_argument(
+        '--threshold', type=float, default=0.2,
+        help='Допустимый рост p95 относительно базового прогона.',
+    )
+    return parser.parse_args(argv)
+
+
+def run(options, out=sys.stdout):
+    """Засеять данные и прогнать сценарии; вернуть результаты."""
+    bench_user = seed(
+        users=options.users,
+        groups=options.groups,
+        posts=options.posts,
+        comments=options.comments,
+        seed=options.seed,
+    )
+    dataset = Dataset(
+        usernames=list(
+            User.objects.filter(posts__isnull=False)
+            .distinct().values_list('username', flat=True)
+        ),
+        slugs=list(Group.objects.values_list('slug', flat=True)),
+        post_ids=list(Post.objects.values_list('pk', flat=True)),
+    )
+    anonymous = Client()
+    authorized = Client()
+    authorized.force_login(bench_user)
+    rng = random.Random(options.seed)
+    results = {
+        'meta': {
+            'created': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'users': options.users,
+            'groups': options.groups,
+            'posts': options.posts,
+            'comments': options.comments,
+            'cold': options.cold,
+        },
+        'scenarios': {},
+    }
+    with override_settings(RATELIMITS=UNLIMITED_RATELIMITS):
+        for name in options.scenarios:
+            scenario = SCENARIOS[name]
+            out.write(f'{name}...\n')
+            results['scenarios'][name] = measure(
+                scenario,
+                authorized if scenario.authorized else anonymous,
+                dataset,
+                rng,
+                options.requests,
+                options.memory_samples,
+                cold=options.cold,
+            )
+    return results
+
+
+def print_table(results, out=sys.stdout):
+    width = max(map(len, results['scenarios']), default=0) + 2
+    out.write(' ' * width + ''.join(
+        f'{column:>16}' for column in COLUMNS
+    ) + '\n')
+    for name, row in results['scenarios'].items():
+        out.write(f'{name:<{width}}' + ''.join(
+            f'{row[column]:>16}' for column in COLUMNS
+        ) + '\n')
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        results = run(options)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+    print_table(results)
+    if options.output:
+        save(results, options.output)
+    if options.baseline:
+        regressions = compare(
+            load(options.baseline), results, options.threshold
+        )
+        for regression in regressions:
+            sys.stdout.write(f'РЕГРЕССИЯ {regression}\n')
+        if regressions:
+            return 1
+    return 0
@@ -0,0 +1,134 @@
+"""Пропускная способность SQLite при нескольких потоках.
+
+Сравнивает настройку по умолчанию (журнал DELETE, записи без очереди)
+с ``SQLITE_PRAGMAS`` и ``write_lock``: потоки читают страницы постов
+и пишут комментарии в общую файловую базу.
+
+    python -m benchmarks concurrency --threads 1 2 4 8
+"""
+import argparse
+import logging
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from posts.models import Post, User
+
+from .runner import percentiles, sample_count, save
+from .seed import BENCH_USERNAME, file_database
+
+
+def worker(post_ids, requests, write_share, seed_value):
+    rng = random.Random(seed_value)
+    client = Client()
+    client.force_login(User.objects.get(username=BENCH_USERNAME))
+    timings = []
+    errors = 0
+    try:
+        for _ in range(requests):
+            post_id = rng.choice(post_ids)
+            start = time.perf_counter()
+            try:
+                if rng.random() < write_share:
+                    response = client.post(
+                        reverse(
+                            'posts:add_comment', kwargs={'post_id': post_id}
+                        ),
+                        {'text': 'Комментарий из замера'},
+                    )
+                else:
+                    response = client.get(reverse(
+                        'posts:post_detail', kwargs={'post_id': post_id}
+                    ))
+                if response.status_code >= 400:
+                    errors += 1
+            except Exception:
+                # Прежде всего «database is locked».
+                errors += 1
+            timings.append(time.perf_counter() - start)
+    finally:
+        connections.close_all()
+    return timings, errors
+
+
+def measure(threads, options, post_ids):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(
+            worker,
+            [post_ids] * threads,
+            [options.requests] * threads,
+            [options.write_share] * threads,
+            range(threads),
+        ))
+    elapsed = time.perf_counter() - start
+    timings = [timing for result, _ in results for timing in result]
+    return {
+        'threads': threads,
+        'requests_per_second': round(len(timings) / elapsed, 1),
+        'p95_ms': round(percentiles(timings)[94] * 1000, 3),
+        'errors': sum(errors for _, errors in results),
+    }
+
+
+def run_mode(tuned, options, out):
+    pragmas = settings.SQLITE_PRAGMAS if tuned else {}
+    # Один пользователь пишет сотни комментариев: лимит частоты выключен.
+    with override_settings(
+        SQLITE_PRAGMAS=pragmas, SQLITE_SERIALIZE_WRITES=tuned,
+        RATELIMIT_ENABLED=False,
+    ), file_database(users=20, groups=5, posts=options.posts, comments=0):
+        post_ids = list(Post.objects.values_list('pk', flat=True))
+        rows = []
+        for threads in options.threads:
+            row = measure(threads, options, post_ids)
+            out.write(
+                '{:<8}{threads:>8}{requests_per_second:>12}'
+                '{p95_ms:>12}{errors:>8}\n'.format(
+                    'tuned' if tuned else 'default', **row
+                )
+            )
+            rows.append(row)
+        return rows
+
+
+def main(argv=None, out=sys.stdout):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks concurrency',
+        description='Запросов в секунду к SQLite по числу потоков.',
+    )
+    parser.add_argument(
+        '--threads', nargs='+', type=int, default=[1, 2, 4, 8]
+    )
+    parser.add_argument(
+        '--requests', type=sample_count, default=200,
+        help='Запросов на поток.',
+    )
+    parser.add_argument(
+        '--write-share', type=float, default=0.3,
+        help='Доля запросов, которые пишут комментарий.',
+    )
+    parser.add_argument('--posts', type=int, default=500)
+    parser.add_argument('--output', help='Куда сохранить результаты (JSON).')
+    options = parser.parse_args(argv)
+    if connection.vendor != 'sqlite':
+        parser.error('замер только для SQLite')
+    # Ошибки блокировки считаются в таблице, трассировки не нужны.
+    for name in ('django.request', 'yatube.performance'):
+        logging.getLogger(name).setLevel(logging.CRITICAL)
+    out.write('{:<8}{:>8}{:>12}{:>12}{:>8}\n'.format(
+        'mode', 'threads', 'req/s', 'p95_ms', 'errors'
+    ))
+    results = {
+        'default': run_mode(False, options, out),
+        'tuned': run_mode(True, options, out),
+    }
+    if options.output:
+        save(results, options.output)
+    return 0
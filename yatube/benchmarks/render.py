@@ -0,0 +1,122 @@
+"""Скорость рендеринга ленты разными шаблонизаторами.
+
+Рендерит ``posts/index.html`` на странице из 10 постов без запросов
+к базе: DjangoTemplates без кеша шаблонов (как при DEBUG),
+с ``cached.Loader`` и Jinja2, если он установлен. В холодном режиме
+кеш карточек очищается перед каждым рендерингом, и ``post_card.html``
+рендерится для каждого поста.
+
+    python -m benchmarks render --renders 200
+"""
+import argparse
+import statistics
+import sys
+import time
+from importlib.util import find_spec
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.template.loader import render_to_string
+from django.test import RequestFactory, override_settings
+from django.urls import resolve, reverse
+
+from posts.models import Post
+from posts.paginators import CursorPaginator
+
+from .runner import clear_caches, percentiles, sample_count, save
+from .seed import seed
+
+PAGE_SIZE = 10
+COLUMNS = ('mean_ms', 'p50_ms', 'p95_ms')
+
+
+def engine_templates(engine):
+    """TEMPLATES с нужным шаблонизатором на первом месте."""
+    django = dict(settings.TEMPLATES[-1])
+    loaders = [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]
+    if engine != 'django':
+        loaders = [('django.template.loaders.cached.Loader', loaders)]
+    django['OPTIONS'] = dict(django['OPTIONS'], loaders=loaders)
+    if engine == 'jinja2':
+        return [settings.JINJA2_TEMPLATES, django]
+    return [django]
+
+
+def engines():
+    names = ['django', 'django-cached']
+    if find_spec('jinja2'):
+        names.append('jinja2')
+    return names
+
+
+def feed_page():
+    """Страница ленты и запрос к главной, как их видит шаблон."""
+    page = CursorPaginator(Post.objects.for_feed(), PAGE_SIZE).cursor_page(
+        None
+    )
+    # Посты загружаются один раз, дальше меряется только рендеринг.
+    page.object_list = list(page.object_list)
+    request = RequestFactory().get(reverse('posts:index'))
+    request.resolver_match = resolve(request.path)
+    request.user = AnonymousUser()
+    return page, request
+
+
+def measure(engine, page, request, renders, cold):
+    timings = []
+    with override_settings(TEMPLATES=engine_templates(engine)):
+        # Первый рендеринг компилирует шаблоны и в замер не входит.
+        render_to_string('posts/index.html', {'page_obj': page}, request)
+        for _ in range(renders):
+            if cold:
+                clear_caches()
+            start = time.perf_counter()
+            render_to_string('posts/index.html', {'page_obj': page}, request)
+            timings.append(time.perf_counter() - start)
+    latency = percentiles(timings, method='inclusive')
+    return {
+        'mean_ms': round(statistics.mean(timings) * 1000, 3),
+        'p50_ms': round(latency[49] * 1000, 3),
+        'p95_ms': round(latency[94] * 1000, 3),
+    }
+
+
+def run(options, out=sys.stdout):
+    seed(users=3, groups=2, posts=PAGE_SIZE, comments=PAGE_SIZE)
+    page, request = feed_page()
+    out.write('{:<24}'.format('engine') + ''.join(
+        f'{column:>12}' for column in COLUMNS
+    ) + '\n')
+    results = {}
+    for engine in engines():
+        for cold in (True, False):
+            name = f'{engine}-{"cold" if cold else "warm"}'
+            row = measure(engine, page, request, options.renders, cold)
+            out.write(f'{name:<24}' + ''.join(
+                f'{row[column]:>12}' for column in COLUMNS
+            ) + '\n')
+            results[name] = row
+    return results
+
+
+def main(argv=None, out=sys.stdout):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks render',
+        description='Время рендеринга ленты из 10 постов.',
+    )
+    parser.add_argument('--renders', type=sample_count, default=200)
+    parser.add_argument('--output', help='Куда сохранить результаты (JSON).')
+    options = parser.parse_args(argv)
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        results = run(options, out)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+    if options.output:
+        save(results, options.output)
+    return 0
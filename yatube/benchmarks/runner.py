@@ -0,0 +1,146 @@
+import argparse
+import json
+import statistics
+import time
+import tracemalloc
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from posts.cache import page_cache, post_card_cache
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def sample_count(value):
+    """Тип argparse: перцентилям нужно хотя бы два замера."""
+    count = int(value)
+    if count < 2:
+        raise argparse.ArgumentTypeError('нужно не меньше 2 замеров')
+    return count
+
+
+def percentiles(timings, method='exclusive'):
+    """Перцентили 1..99; при одном замере все равны ему.
+
+    Те же, что statistics.quantiles(n=100) из Python 3.8, посчитанные
+    здесь же: CI проверяет и Python 3.7.
+    """
+    if len(timings) < 2:
+        return [timings[0] if timings else 0.0] * 99
+    data = sorted(timings)
+    size = len(data)
+    result = []
+    for index in range(1, 100):
+        if method == 'inclusive':
+            low, delta = divmod(index * (size - 1), 100)
+        else:
+            # Крайние перцентили не выходят за первый и последний замер.
+            high = min(max(index * (size + 1) // 100, 1), size - 1)
+            low, delta = high - 1, index * (size + 1) - high * 100
+        result.append(
+            (data[low] * (100 - delta) + data[low + 1] * delta) / 100
+        )
+    return result
+
+
+def reset_memory_peak():
+    """Обнуляет пик tracemalloc перед очередным замером.
+
+    reset_peak() появился в Python 3.9; раньше пик сбрасывал только
+    clear_traces() вместе со всеми трассами.
+    """
+    if hasattr(tracemalloc, 'reset_peak'):
+        tracemalloc.reset_peak()
+    else:
+        tracemalloc.clear_traces()
+
+
+def clear_caches():
+    page_cache().clear()
+    post_card_cache().clear()
+
+
+def run_request(scenario, client, dataset, rng, cold):
+    if cold:
+        clear_caches()
+    response = scenario.request(client, dataset, rng)
+    if response.status_code >= 400:
+        raise BenchmarkError(
+            f'{scenario.name}: ответ {response.status_code}'
+        )
+    return response
+
+
+def measure(scenario, client, dataset, rng, requests, memory_samples,
+            cold=False):
+    """Задержки и число запросов к базе, затем пик памяти.
+
+    Память меряется отдельным коротким проходом: tracemalloc
+    заметно замедляет код и исказил бы задержки.
+    """
+    timings = []
+    queries = []
+    peak = 0
+    with override_settings(**(scenario.settings or {})):
+        for _ in range(requests):
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                run_request(scenario, client, dataset, rng, cold)
+                timings.append(time.perf_counter() - start)
+            queries.append(len(captured))
+        tracemalloc.start()
+        try:
+            for _ in range(memory_samples):
+                reset_memory_peak()
+                run_request(scenario, client, dataset, rng, cold)
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+    latency = percentiles(timings, method='inclusive')
+    return {
+        'requests': requests,
+        'mean_ms': round(statistics.mean(timings) * 1000, 3),
+        'p50_ms': round(latency[49] * 1000, 3),
+        'p95_ms': round(latency[94] * 1000, 3),
+        'p99_ms': round(latency[98] * 1000, 3),
+        'queries_mean': round(statistics.mean(queries), 2),
+        'queries_max': max(queries),
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def compare(baseline, results, threshold):
+    """Регрессии относительно прошлого прогона.
+
+    Регрессия — p95 больше базового на долю ``threshold``
+    или больше запросов к базе, чем в базовом прогоне.
+    """
+    regressions = []
+    for name, current in results['scenarios'].items():
+        base = baseline['scenarios'].get(name)
+        if base is None:
+            continue
+        if current['p95_ms'] > base['p95_ms'] * (1 + threshold):
+            regressions.append(
+                f"{name}: p95 {base['p95_ms']} -> {current['p95_ms']} мс"
+            )
+        if current['queries_max'] > base['queries_max']:
+            regressions.append(
+                f"{name}: запросов к базе {base['queries_max']} -> "
+                f"{current['queries_max']}"
+            )
+    return regressions
+
+
+def load(path):
+    with open(path, encoding='utf-8') as stream:
+        return json.load(stream)
+
+
+def save(results, path):
+    with open(path, 'w', encoding='utf-8') as stream:
+        json.dump(results, stream, ensure_ascii=False, indent=2)
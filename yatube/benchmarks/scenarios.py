@@ -0,0 +1,84 @@
+from collections import namedtuple
+
+from django.urls import reverse
+
+# request(client, dataset, rng) делает один запрос и возвращает ответ,
+# settings — настройки, которые подменяются на время сценария.
+Scenario = namedtuple(
+    'Scenario', 'name authorized request settings', defaults=(None,)
+)
+# Лимиты частоты, которые замер не исчерпает: ограничитель работает,
+# но не отказывает.
+UNLIMITED_RATELIMITS = {
+    'post_create': {'user': '1000000/s', 'ip': '1000000/s'},
+    'add_comment': {'user': '1000000/s', 'ip': '1000000/s'},
+}
+
+
+class Dataset:
+    """Ключи засеянных данных, из которых сценарии выбирают случайно."""
+
+    def __init__(self, usernames, slugs, post_ids):
+        self.usernames = usernames
+        self.slugs = slugs
+        self.post_ids = post_ids
+
+
+def index(client, dataset, rng):
+    return client.get(reverse('posts:index'))
+
+
+def group_posts(client, dataset, rng):
+    return client.get(reverse(
+        'posts:group_list', kwargs={'slug': rng.choice(dataset.slugs)}
+    ))
+
+
+def profile(client, dataset, rng):
+    return client.get(reverse(
+        'posts:profile', kwargs={'username': rng.choice(dataset.usernames)}
+    ))
+
+
+def post_detail(client, dataset, rng):
+    return client.get(reverse(
+        'posts:post_detail', kwargs={'post_id': rng.choice(dataset.post_ids)}
+    ))
+
+
+def follow_index(client, dataset, rng):
+    return client.get(reverse('posts:follow_index'))
+
+
+def post_create(client, dataset, rng):
+    return client.post(reverse('posts:post_create'), {
+        'text': 'Пост из замера {}'.format(rng.random()),
+    })
+
+
+def add_comment(client, dataset, rng):
+    return client.post(
+        reverse(
+            'posts:add_comment',
+            kwargs={'post_id': rng.choice(dataset.post_ids)},
+        ),
+        {'text': 'Комментарий из замера'},
+    )
+
+
+SCENARIOS = {
+    scenario.name: scenario for scenario in (
+        Scenario('index', False, index),
+        Scenario('group_posts', False, group_posts),
+        Scenario('profile', False, profile),
+        Scenario('post_detail', False, post_detail),
+        Scenario('follow_index', True, follow_index),
+        Scenario('post_create', True, post_create),
+        Scenario('add_comment', True, add_comment),
+        # Вместе с add_comment показывает цену ограничителя частоты.
+        Scenario(
+            'add_comment_no_ratelimit', True, add_comment,
+            {'RATELIMIT_ENABLED': False},
+        ),
+    )
+}
@@ -0,0 +1,94 @@
+import os
+import random
+import tempfile
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import connection
+from django.utils import timezone
+from faker import Faker
+from mixer.backend.django import mixer
+
+from posts.content import ContentImporter
+from posts.models import Follow, Group, User
+
+BENCH_USERNAME = 'bench_user'
+FOLLOWED_AUTHORS = 20
+
+
+def generate_records(users, groups, posts, comments, rng, fake):
+    now = timezone.now()
+    for number in range(1, posts + 1):
+        yield {
+            'model': 'post',
+            'id': number,
+            'text': fake.text(max_nb_chars=400),
+            'author': rng.choice(users),
+            'group': rng.choice(groups) if rng.random() < 0.7 else None,
+            'pub_date': (
+                now - timedelta(minutes=rng.randrange(365 * 24 * 60))
+            ).isoformat(),
+        }
+    for _ in range(comments):
+        yield {
+            'model': 'comment',
+            'post': rng.randint(1, posts),
+            'author': rng.choice(users),
+            'text': fake.sentence(),
+        }
+
+
+def seed(users=200, groups=20, posts=10000, comments=20000, seed=0):
+    """Наполнить базу: пользователи и группы через mixer,
+    посты и комментарии с текстами Faker через пакетный импорт."""
+    rng = random.Random(seed)
+    fake = Faker('ru_RU')
+    fake.seed_instance(seed)
+    authors = mixer.cycle(users).blend(
+        User, username=mixer.sequence('author_{0}')
+    )
+    mixer.cycle(groups).blend(
+        Group,
+        slug=mixer.sequence('group-{0}'),
+        title=mixer.sequence('Группа {0}'),
+    )
+    bench_user = User.objects.create_user(username=BENCH_USERNAME)
+    for author in rng.sample(authors, min(FOLLOWED_AUTHORS, users)):
+        Follow.objects.create(user=bench_user, author=author)
+    importer = ContentImporter()
+    for _ in importer.run(generate_records(
+        [author.username for author in authors],
+        list(Group.objects.values_list('slug', flat=True)),
+        posts, comments, rng, fake,
+    )):
+        pass
+    importer.finish()
+    return bench_user
+
+
+@contextmanager
+def file_database(**seed_options):
+    """Временная файловая база с данными для замеров под нагрузкой.
+
+    Замеры в несколько потоков идут не по базе в памяти: в ней не видно
+    ни блокировок записи, ни работы с диском.
+    """
+    test_settings = connection.settings_dict['TEST']
+    old_test_name = test_settings['NAME']
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        test_settings['NAME'] = os.path.join(tmp_dir, 'bench.sqlite3')
+        old_name = connection.settings_dict['NAME']
+        try:
+            connection.creation.create_test_db(
+                verbosity=0, autoclobber=True
+            )
+            try:
+                seed(**seed_options)
+                connection.close()
+                yield
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+        finally:
+            # Иначе следующая тестовая база откроется в удалённом
+            # временном каталоге.
+            test_settings['NAME'] = old_test_name
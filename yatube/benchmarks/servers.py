@@ -0,0 +1,198 @@
+"""Пропускная способность страниц через настоящий HTTP-сервер.
+
+Сравнивает WSGI (многопоточный wsgiref, как у runserver) и ASGI
+(uvicorn с ``yatube.asgi``, если установлены uvicorn и asgiref) при
+нескольких одновременных клиентах. Серверы и клиенты работают в одном
+процессе, поэтому цифры годятся для сравнения, а не как абсолютные.
+
+    python -m benchmarks http --concurrency 1 8 32
+"""
+import argparse
+import random
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from importlib.util import find_spec
+from socketserver import ThreadingMixIn
+from urllib.error import URLError
+from urllib.request import urlopen
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+
+from .runner import percentiles, sample_count, save
+from .seed import file_database
+
+STARTUP_TIMEOUT = 10
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def wsgi_server():
+    server = make_server(
+        '127.0.0.1', 0, get_wsgi_application(),
+        server_class=ThreadingWSGIServer, handler_class=QuietHandler,
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f'http://127.0.0.1:{server.server_port}'
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def asgi_server():
+    import uvicorn
+
+    from yatube.asgi import application
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(
+        application, host='127.0.0.1', port=port,
+        log_level='warning', lifespan='off',
+    ))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while not server.started and time.monotonic() < deadline:
+        time.sleep(0.05)
+    try:
+        yield f'http://127.0.0.1:{port}'
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+# Сервер и модули, без которых он не запустится.
+SERVERS = {
+    'wsgi': (wsgi_server, ()),
+    'asgi': (asgi_server, ('uvicorn', 'asgiref')),
+}
+
+
+def read_paths():
+    """Адреса страниц, которые только читают: ленты и посты."""
+    paths = [reverse('posts:index')]
+    paths += [
+        reverse('posts:group_list', kwargs={'slug': slug})
+        for slug in Group.objects.values_list('slug', flat=True)
+    ]
+    paths += [
+        reverse('posts:profile', kwargs={'username': username})
+        for username in User.objects.filter(
+            posts__isnull=False
+        ).distinct().values_list('username', flat=True)
+    ]
+    paths += [
+        reverse('posts:post_detail', kwargs={'post_id': pk})
+        for pk in Post.objects.values_list('pk', flat=True)[:500]
+    ]
+    return paths
+
+
+def client(url, paths, requests, seed_value):
+    rng = random.Random(seed_value)
+    timings = []
+    errors = 0
+    for _ in range(requests):
+        start = time.perf_counter()
+        try:
+            with urlopen(url + rng.choice(paths), timeout=30) as response:
+                response.read()
+        except (URLError, OSError):
+            errors += 1
+        timings.append(time.perf_counter() - start)
+    return timings, errors
+
+
+def measure(url, paths, concurrency, requests):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(
+            client,
+            [url] * concurrency,
+            [paths] * concurrency,
+            [requests] * concurrency,
+            range(concurrency),
+        ))
+    elapsed = time.perf_counter() - start
+    timings = [timing for result, _ in results for timing in result]
+    latency = percentiles(timings)
+    return {
+        'concurrency': concurrency,
+        'requests_per_second': round(len(timings) / elapsed, 1),
+        'p50_ms': round(latency[49] * 1000, 3),
+        'p95_ms': round(latency[94] * 1000, 3),
+        'errors': sum(errors for _, errors in results),
+    }
+
+
+def main(argv=None, out=sys.stdout):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks http',
+        description='Запросов в секунду через WSGI и ASGI серверы.',
+    )
+    parser.add_argument(
+        '--concurrency', nargs='+', type=int, default=[1, 8, 32]
+    )
+    parser.add_argument(
+        '--requests', type=sample_count, default=100,
+        help='Запросов на клиента.',
+    )
+    parser.add_argument('--posts', type=int, default=2000)
+    parser.add_argument('--output', help='Куда сохранить результаты (JSON).')
+    options = parser.parse_args(argv)
+    results = {}
+    out.write('{:<6}{:>12}{:>12}{:>12}{:>12}{:>8}\n'.format(
+        'server', 'concurrency', 'req/s', 'p50_ms', 'p95_ms', 'errors'
+    ))
+    with file_database(
+        users=200, groups=20, posts=options.posts, comments=options.posts
+    ):
+        # Сервер заводит поток на запрос: постоянные соединения
+        # остались бы открытыми после завершения потоков.
+        connection.settings_dict['CONN_MAX_AGE'] = 0
+        paths = read_paths()
+        connection.close()
+        for name, (server, modules) in SERVERS.items():
+            missing = [module for module in modules if not find_spec(module)]
+            if missing:
+                out.write(f'{name}: пропущен, нет {", ".join(missing)}\n')
+                continue
+            rows = results[name] = []
+            with server() as url:
+                for concurrency in options.concurrency:
+                    row = measure(url, paths, concurrency, options.requests)
+                    out.write(
+                        '{:<6}{concurrency:>12}{requests_per_second:>12}'
+                        '{p50_ms:>12}{p95_ms:>12}{errors:>8}\n'.format(
+                            name, **row
+                        )
+                    )
+                    rows.append(row)
+    if options.output:
+        save(results, options.output)
+    return 0
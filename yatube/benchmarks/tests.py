@@ -0,0 +1,75 @@
+import statistics
+import unittest
+from argparse import Namespace
+from io import StringIO
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+
+from . import render
+from .cli import parse_args, run
+from .runner import compare, percentiles
+from .seed import file_database
+
+
+class BenchmarkTests(TestCase):
+    def test_small_run(self):
+        """Все сценарии проходят на маленьком наборе данных."""
+        options = parse_args([
+            '--users', '3', '--groups', '2', '--posts', '20',
+            '--comments', '10', '--requests', '2', '--memory-samples', '1',
+        ])
+        results = run(options, out=StringIO())
+        self.assertEqual(
+            set(results['scenarios']), set(options.scenarios)
+        )
+        for row in results['scenarios'].values():
+            self.assertLessEqual(row['p50_ms'], row['p99_ms'])
+
+    def test_compare_flags_regressions(self):
+        baseline = {'scenarios': {
+            'index': {'p95_ms': 10, 'queries_max': 2},
+        }}
+        results = {'scenarios': {
+            'index': {'p95_ms': 11, 'queries_max': 3},
+        }}
+        self.assertEqual(len(compare(baseline, results, 0.2)), 1)
+        self.assertEqual(len(compare(baseline, results, 0.05)), 2)
+
+    def test_single_sample(self):
+        """Один замер не ломает перцентили, а CLI требует хотя бы два."""
+        self.assertEqual(percentiles([0.5])[94], 0.5)
+        with self.assertRaises(SystemExit):
+            parse_args(['--requests', '1'])
+
+    @unittest.skipUnless(hasattr(statistics, 'quantiles'), 'Python 3.8+')
+    def test_percentiles_match_statistics(self):
+        """Перцентили совпадают с statistics.quantiles обоих методов."""
+        timings = [0.3, 0.1, 0.7, 0.2, 0.9, 0.4, 0.05]
+        for method in ('inclusive', 'exclusive'):
+            with self.subTest(method=method):
+                expected = statistics.quantiles(
+                    timings, n=100, method=method
+                )
+                for ours, theirs in zip(percentiles(timings, method),
+                                        expected):
+                    self.assertAlmostEqual(ours, theirs)
+
+    def test_file_database_restores_test_name(self):
+        """Временная база не остаётся в настройках соединения."""
+        test_name = connection.settings_dict['TEST']['NAME']
+        with mock.patch.object(
+            connection.creation, 'create_test_db', side_effect=OSError
+        ), self.assertRaises(OSError):
+            with file_database():
+                pass
+        self.assertEqual(connection.settings_dict['TEST']['NAME'], test_name)
+
+    def test_render_engines(self):
+        """Лента рендерится каждым доступным шаблонизатором."""
+        results = render.run(Namespace(renders=2), out=StringIO())
+        self.assertEqual(
+            [name.rsplit('-', 1)[0] for name in results][::2],
+            render.engines(),
+        )
@@ -0,0 +1,41 @@
+"""Окружение Jinja2 для шаблонов из ``templates_jinja2/``.
+
+Подключается настройкой ``YATUBE_JINJA2=1``; шаблоны, которых нет
+в ``templates_jinja2/``, по-прежнему рендерит DjangoTemplates.
+"""
+from django.template.backends.jinja2 import Jinja2
+from django.template.defaultfilters import date
+from django.templatetags.static import static
+from django.urls import reverse
+from jinja2 import Environment
+
+from posts.cache import render_post_cards
+
+from .metrics import TimedTemplate
+from .templatetags.user_filters import addclass
+
+
+def url(name, *args, **kwargs):
+    return reverse(name, args=args, kwargs=kwargs)
+
+
+def environment(**options):
+    env = Environment(**options)
+    env.globals.update({
+        'static': static,
+        'url': url,
+        'post_cards': render_post_cards,
+    })
+    env.filters.update({
+        'addclass': addclass,
+        'date': date,
+    })
+    return env
+
+
+class TimedJinja2(Jinja2):
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
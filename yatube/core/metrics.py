@@ -0,0 +1,85 @@
+"""Замеры одного запроса: время SQL и рендеринга шаблонов.
+
+Метрики текущего запроса живут в thread-local, их заполняют обёртка
+выполнения SQL (``connection.execute_wrapper``) и бэкенд шаблонов
+``TimedDjangoTemplates``. Вне замера обе обходятся одной проверкой.
+"""
+import heapq
+import threading
+import time
+
+from django.template.backends.django import DjangoTemplates
+
+_local = threading.local()
+
+
+def current():
+    return getattr(_local, 'metrics', None)
+
+
+class RequestMetrics:
+    def __init__(self, max_queries):
+        self.max_queries = max_queries
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        # Мин-куча из max_queries самых долгих запросов: в корне —
+        # самый быстрый из них, его и вытесняет более долгий.
+        self.queries = []
+
+    def __enter__(self):
+        _local.metrics = self
+        return self
+
+    def __exit__(self, *exc_info):
+        _local.metrics = None
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.sql_count += 1
+            self.sql_time += duration
+            if len(self.queries) < self.max_queries:
+                heapq.heappush(self.queries, (duration, sql))
+            elif self.queries and duration > self.queries[0][0]:
+                heapq.heappushpop(self.queries, (duration, sql))
+
+
+class TimedTemplate:
+    """Шаблон, который засекает время самого внешнего рендеринга.
+
+    Вложенные рендеринги (render_to_string из тегов) уже входят
+    во время внешнего и отдельно не считаются.
+    """
+
+    def __init__(self, template):
+        # Не self.template: у шаблона бэкенда это атрибут самого шаблона.
+        self._wrapped = template
+
+    def __getattr__(self, name):
+        return getattr(self._wrapped, name)
+
+    def render(self, context=None, request=None):
+        metrics = current()
+        if metrics is None:
+            return self._wrapped.render(context, request)
+        metrics.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return self._wrapped.render(context, request)
+        finally:
+            metrics.template_depth -= 1
+            if not metrics.template_depth:
+                metrics.template_time += time.perf_counter() - start
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
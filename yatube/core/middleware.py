@@ -0,0 +1,129 @@
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .metrics import RequestMetrics
+from .routers import use_replica
+
+logger = logging.getLogger('yatube.performance')
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class PerformanceMiddleware:
+    """Время запроса, SQL и шаблонов в логе и в Server-Timing.
+
+    Замеряется доля ``PERF_SAMPLE_RATE`` запросов. SQL считается только
+    у соединений ``connections.all()`` текущего потока: запросы из других
+    потоков в замер не попадают. Запрос дольше ``PERF_SLOW_REQUEST_MS``
+    пишется в лог предупреждением вместе с самыми долгими запросами
+    к базе. Server-Timing получают только при ``DEBUG`` и персонал:
+    остальным незачем видеть, сколько запросов делает страница.
+    При ``PERF_METRICS_ENABLED = False`` middleware отключается целиком.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PERF_METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = settings.PERF_SAMPLE_RATE
+        self.slow_request = settings.PERF_SLOW_REQUEST_MS / 1000
+        self.max_queries = settings.PERF_SLOW_QUERIES_LOGGED
+
+    def __call__(self, request):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return self.get_response(request)
+        with ExitStack() as stack:
+            metrics = stack.enter_context(RequestMetrics(self.max_queries))
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(metrics.execute_wrapper)
+                )
+            start = time.perf_counter()
+            response = self.get_response(request)
+            total = time.perf_counter() - start
+        if settings.DEBUG or is_staff(request):
+            response['Server-Timing'] = server_timing(metrics, total)
+        self.log(request, response, metrics, total)
+        return response
+
+    def log(self, request, response, metrics, total):
+        data = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 1),
+            'sql_ms': round(metrics.sql_time * 1000, 1),
+            'sql_count': metrics.sql_count,
+            'template_ms': round(metrics.template_time * 1000, 1),
+        }
+        message = ' '.join(f'{key}={value}' for key, value in data.items())
+        if total < self.slow_request:
+            logger.info(message, extra={'performance': data})
+            return
+        queries = sorted(metrics.queries, reverse=True)
+        logger.warning(
+            'slow %s\n%s',
+            message,
+            '\n'.join(
+                f'  {duration * 1000:.1f} ms: {sql}'
+                for duration, sql in queries
+            ),
+            extra={'performance': data},
+        )
+
+
+def is_staff(request):
+    # request.user ставит AuthenticationMiddleware, она стоит ниже.
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_staff
+
+
+def server_timing(metrics, total):
+    return ', '.join((
+        f'total;dur={total * 1000:.1f}',
+        f'db;dur={metrics.sql_time * 1000:.1f};'
+        f'desc="{metrics.sql_count} queries"',
+        f'tpl;dur={metrics.template_time * 1000:.1f}',
+    ))
+
+
+class ReplicaRoutingMiddleware:
+    """Чтение с реплик для представлений из ``REPLICA_VIEWS``.
+
+    После запроса, который что-то меняет, посетитель получает cookie
+    ``REPLICA_PIN_COOKIE`` на ``REPLICA_PIN_SECONDS`` и всё это время
+    читает из ``default``, чтобы видеть свои изменения.
+    Без ``DATABASE_REPLICAS`` middleware отключается.
+    """
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            response = self.get_response(request)
+        finally:
+            use_replica(False)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE,
+                '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        use_replica(
+            request.method in SAFE_METHODS
+            and request.resolver_match.view_name in settings.REPLICA_VIEWS
+            and settings.REPLICA_PIN_COOKIE not in request.COOKIES
+        )
@@ -0,0 +1,47 @@
+import json
+from collections import Counter
+
+from django.db import migrations
+
+
+def count_post_files(apps, schema_editor):
+    """Ссылки постов на картинки и их варианты, сохранённые до StoredFile.
+
+    Без строки хранилище удалило бы такой файл при первом же delete(),
+    даже если на него ссылаются другие посты.
+    """
+    Post = apps.get_model('posts', 'Post')
+    StoredFile = apps.get_model('core', 'StoredFile')
+    references = Counter()
+    rows = Post.objects.order_by().values_list('image', 'image_variants')
+    for image, image_variants in rows.iterator():
+        if image:
+            references[image] += 1
+        try:
+            variants = json.loads(image_variants or '[]')
+        except ValueError:
+            continue
+        references.update(variant['name'] for variant in variants)
+    existing = set(StoredFile.objects.values_list('name', flat=True))
+    # Строки, созданные уже хранилищем, пересчитываются по постам.
+    for name in existing & set(references):
+        StoredFile.objects.filter(name=name).update(
+            references=references[name]
+        )
+    StoredFile.objects.bulk_create(
+        [StoredFile(name=name, references=count)
+         for name, count in references.items() if name not in existing],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_stored_file'),
+        ('posts', '0015_listing_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(count_post_files, migrations.RunPython.noop),
+    ]
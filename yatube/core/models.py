@@ -0,0 +1,34 @@
+from django.db import models
+
+
+class StoredFile(models.Model):
+    """Файл хранилища с адресацией по содержимому (``core.storage``).
+
+    ``references`` — сколько сохранений ссылается на файл: хранилище
+    удаляет файл, когда счётчик доходит до нуля.
+    """
+    name = models.CharField(
+        'Имя',
+        max_length=255,
+        primary_key=True
+    )
+    size = models.BigIntegerField(
+        'Размер',
+        blank=True,
+        null=True
+    )
+    references = models.PositiveIntegerField(
+        'Число ссылок',
+        default=0
+    )
+    created = models.DateTimeField(
+        'Загружен',
+        auto_now_add=True
+    )
+
+    class Meta:
+        verbose_name = 'Файл'
+        verbose_name_plural = 'Файлы'
+
+    def __str__(self):
+        return f'{self.name}: {self.references}'
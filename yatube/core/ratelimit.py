@@ -0,0 +1,164 @@
+"""Ограничение частоты записей корзинами токенов (token bucket).
+
+У каждого посетителя на каждую область (``scope``) две корзины:
+по пользователю и по IP. Корзина ``N/m`` вмещает N токенов и полностью
+наполняется за минуту; запрос забирает токен, пустая корзина — ответ
+429. Корзины лежат в кеше ``RATELIMIT_CACHE``, чтобы лимит был общим
+для процессов. Если кеш не задан или недоступен, корзины живут
+в словаре процесса. Чтение и запись корзины в кеше не атомарны,
+поэтому несколько процессов вместе изредка пропускают лишний запрос.
+"""
+import math
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+RATE_PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+BUCKET_KEY = 'ratelimit:{}:{}:{}'
+LOCAL_MAX_ENTRIES = 10000
+
+_lock = threading.Lock()
+_local_buckets = {}
+
+
+class RateLimited(Exception):
+    def __init__(self, scope, retry_after):
+        super().__init__(f'{scope}: повторите через {retry_after} с')
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+def parse_rate(rate):
+    """'10/m' -> (10, 60): ёмкость корзины и время её наполнения."""
+    count, period = rate.split('/')
+    return int(count), RATE_PERIODS[period]
+
+
+def refill(bucket, capacity, period, now):
+    if bucket is None:
+        return float(capacity)
+    tokens, stamp = bucket
+    return min(capacity, tokens + (now - stamp) * capacity / period)
+
+
+def take_local(key, capacity, period, now, consume=True):
+    with _lock:
+        if len(_local_buckets) >= LOCAL_MAX_ENTRIES:
+            # Корзины, которые успели наполниться, хранить незачем.
+            for old_key, (_, stamp, old_period) in list(
+                    _local_buckets.items()):
+                if now - stamp >= old_period:
+                    del _local_buckets[old_key]
+        bucket = _local_buckets.get(key)
+        tokens = refill(bucket and bucket[:2], capacity, period, now)
+        allowed = tokens >= 1
+        if consume:
+            _local_buckets[key] = (tokens - allowed, now, period)
+    return allowed, tokens
+
+
+def take_cached(cache, key, capacity, period, now, consume=True):
+    tokens = refill(cache.get(key), capacity, period, now)
+    allowed = tokens >= 1
+    if consume:
+        # Через period корзина полна, и запись можно не хранить.
+        cache.set(key, (tokens - allowed, now), math.ceil(period))
+    return allowed, tokens
+
+
+def take(key, rate, now=None, consume=True):
+    """Забрать токен; вернуть 0 или секунды до появления токена.
+
+    С ``consume=False`` корзина только проверяется.
+    """
+    capacity, period = parse_rate(rate)
+    now = time.time() if now is None else now
+    if settings.RATELIMIT_CACHE is None:
+        allowed, tokens = take_local(key, capacity, period, now, consume)
+    else:
+        try:
+            allowed, tokens = take_cached(
+                caches[settings.RATELIMIT_CACHE],
+                key, capacity, period, now, consume,
+            )
+        except Exception:
+            # Кеш недоступен: лимит на процесс лучше, чем никакого.
+            allowed, tokens = take_local(
+                key, capacity, period, now, consume
+            )
+    if allowed:
+        return 0
+    return (1 - tokens) * period / capacity
+
+
+def client_ip(request):
+    """IP посетителя.
+
+    X-Forwarded-For учитывается, только если запрос пришёл от прокси
+    из ``RATELIMIT_TRUSTED_PROXIES``: адреса в нём читаются справа
+    налево, и первый не доверенный — адрес посетителя. Левее него
+    заголовок мог написать сам посетитель.
+    """
+    address = request.META.get('REMOTE_ADDR', '')
+    trusted = settings.RATELIMIT_TRUSTED_PROXIES
+    if address not in trusted:
+        return address
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')
+    for hop in reversed(forwarded):
+        hop = hop.strip()
+        if not hop:
+            continue
+        address = hop
+        if hop not in trusted:
+            break
+    return address
+
+
+def check(request, scope):
+    """Поднять RateLimited, если посетитель исчерпал лимит ``scope``.
+
+    Токены забираются, только если они есть во всех корзинах: отказ
+    по IP не должен тратить лимит пользователя, и наоборот.
+    """
+    rates = settings.RATELIMITS[scope]
+    idents = {'ip': client_ip(request)}
+    if request.user.is_authenticated:
+        idents['user'] = request.user.pk
+    buckets = [
+        (BUCKET_KEY.format(scope, kind, ident), rates[kind])
+        for kind, ident in idents.items() if kind in rates
+    ]
+    now = time.time()
+    for consume in (False, True):
+        wait = max(
+            (take(key, rate, now, consume) for key, rate in buckets),
+            default=0,
+        )
+        if wait:
+            raise RateLimited(scope, math.ceil(wait))
+
+
+def ratelimit(scope):
+    """Ограничить изменяющие запросы представления лимитом ``scope``.
+
+    Лимиты задаются в ``settings.RATELIMITS``, превышение отдаёт
+    представление ``RATELIMIT_VIEW`` (по умолчанию 429 из core.views).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (request.method not in SAFE_METHODS
+                    and settings.RATELIMIT_ENABLED):
+                try:
+                    check(request, scope)
+                except RateLimited as exception:
+                    handler = import_string(settings.RATELIMIT_VIEW)
+                    return handler(request, exception)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,41 @@
+"""Чтение с реплик базы для страниц, которые только читают.
+
+``ReplicaRoutingMiddleware`` включает чтение с реплики на время
+представления из ``settings.REPLICA_VIEWS``; остальные запросы, все
+записи и сессии идут в ``default``.
+"""
+import random
+import threading
+
+from django.conf import settings
+
+# Сессия нужна сразу после входа: реплика могла ещё не получить её.
+PRIMARY_APPS = {'sessions'}
+
+_local = threading.local()
+
+
+def use_replica(enabled):
+    _local.replica = enabled
+
+
+def replica_enabled():
+    return getattr(_local, 'replica', False)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (replica_enabled() and settings.DATABASE_REPLICAS
+                and model._meta.app_label not in PRIMARY_APPS):
+            return self.choose_replica()
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии default, объекты из них связаны между собой.
+        return True
+
+    def choose_replica(self):
+        return random.choice(settings.DATABASE_REPLICAS)
@@ -0,0 +1,38 @@
+"""Настройка SQLite для конкурентной нагрузки.
+
+Каждое новое соединение получает PRAGMA из ``settings.SQLITE_PRAGMAS``:
+WAL позволяет читать во время записи, busy_timeout ждёт блокировку
+вместо мгновенного «database is locked». Записи внутри процесса идут
+по одной через ``write_lock``: SQLite всё равно пишет в один поток,
+а очередь на блокировке процесса дешевле ожидания в busy_timeout.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+_write_lock = threading.RLock()
+
+
+@receiver(connection_created)
+def apply_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@contextmanager
+def write_lock(using='default'):
+    """Транзакция записи, по одной на процесс для SQLite."""
+    if (connections[using].vendor != 'sqlite'
+            or not settings.SQLITE_SERIALIZE_WRITES):
+        with transaction.atomic(using=using):
+            yield
+        return
+    with _write_lock, transaction.atomic(using=using):
+        yield
@@ -0,0 +1,159 @@
+"""Хранилище файлов с адресацией по содержимому.
+
+Имя файла — SHA-256 его содержимого, разложенный по вложенным папкам
+(``posts/ab/cd/abcd….jpg``): одинаковые картинки хранятся один раз,
+а в одной папке не скапливаются сотни тысяч файлов. Хэш считается
+за один проход по загрузке, пока она копируется во временный файл.
+Число сохранений, ссылающихся на файл, хранит ``StoredFile``:
+``delete()`` уменьшает счётчик и удаляет сам файл, когда ссылок
+не осталось. Файлы, сохранённые мимо этого хранилища, удаляются сразу.
+
+Сами файлы лежат во внутреннем хранилище ``settings.CONTENT_STORAGE``:
+по умолчанию FileSystemStorage в MEDIA_ROOT, для S3-совместимого —
+например, ``storages.backends.s3boto3.S3Boto3Storage`` из
+django-storages. От внутреннего хранилища нужны только save, open,
+exists, delete, size и url.
+"""
+import hashlib
+import posixpath
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import Storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+from django.utils.module_loading import import_string
+
+from .models import StoredFile
+from .sqlite import write_lock
+
+# Загрузка до 2 МБ хэшируется в памяти, больше — во временном файле.
+SPOOL_MAX_SIZE = 2 * 1024 * 1024
+# Две папки по два символа хэша: 65536 папок на каталог загрузки.
+SHARD_DEPTH = 2
+SHARD_WIDTH = 2
+
+
+def inner_storage():
+    config = settings.CONTENT_STORAGE
+    return import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+
+
+def content_name(name, digest):
+    """Имя по хэшу в каталоге и с расширением исходного имени."""
+    directory, basename = posixpath.split(name)
+    extension = posixpath.splitext(basename)[1].lower()
+    shards = [
+        digest[level * SHARD_WIDTH:(level + 1) * SHARD_WIDTH]
+        for level in range(SHARD_DEPTH)
+    ]
+    return posixpath.join(directory, *shards, digest + extension)
+
+
+def spool(content):
+    """Прочитать загрузку кусками: (sha256, размер, копия содержимого)."""
+    digest = hashlib.sha256()
+    size = 0
+    copy = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    for chunk in content.chunks():
+        digest.update(chunk)
+        copy.write(chunk)
+        size += len(chunk)
+    copy.seek(0)
+    return digest.hexdigest(), size, copy
+
+
+@deconstructible
+class ContentAddressedStorage(Storage):
+    def __init__(self, inner=None):
+        self.inner = inner if inner is not None else inner_storage()
+
+    def get_available_name(self, name, max_length=None):
+        # Имя всё равно заменяется хэшем, занятость не важна.
+        return name
+
+    def _save(self, name, content):
+        digest, size, copy = spool(content)
+        name = content_name(name, digest)
+        with copy:
+            # Ссылка считается только на уже сохранённый файл.
+            self.store(name, copy)
+            self.retain(name, size=size)
+            if not self.inner.exists(name):
+                # Другой процесс отпустил последнюю ссылку и удалил
+                # файл до retain(): теперь ссылка наша, сохраняем снова.
+                self.store(name, copy)
+        return name
+
+    def store(self, name, copy):
+        if self.inner.exists(name):
+            return
+        copy.seek(0)
+        stored = self.inner.save(name, File(copy, name))
+        if stored != name:
+            # Внутреннее хранилище переименовало файл: такой
+            # уже записал другой процесс.
+            self.inner.delete(stored)
+
+    def retain(self, name, count=1, size=None):
+        """Добавить ссылки на файл, сохранённый раньше (импорт постов)."""
+        with write_lock():
+            files = StoredFile.objects.filter(name=name)
+            if files.update(references=F('references') + count):
+                return
+            try:
+                # Точка сохранения: при гонке внешняя транзакция
+                # не ломается.
+                with transaction.atomic():
+                    StoredFile.objects.create(
+                        name=name, size=size, references=count
+                    )
+            except IntegrityError:
+                # Строку только что создал другой процесс.
+                files.update(references=F('references') + count)
+
+    def delete(self, name):
+        files = StoredFile.objects.filter(name=name)
+        with write_lock():
+            while True:
+                # Каждый шаг — одно условное изменение строки: ссылки,
+                # добавленные другим процессом между шагами, не теряются.
+                if files.filter(references__gt=1).update(
+                    references=F('references') - 1
+                ):
+                    return
+                if files.filter(references__lte=1).delete()[0]:
+                    break
+                if not files.exists():
+                    # Файл сохранён мимо хранилища, ссылок не считали.
+                    break
+            self.inner.delete(name)
+
+    def _open(self, name, mode='rb'):
+        return self.inner.open(name, mode)
+
+    def exists(self, name):
+        return self.inner.exists(name)
+
+    def path(self, name):
+        return self.inner.path(name)
+
+    def size(self, name):
+        return self.inner.size(name)
+
+    def url(self, name):
+        return self.inner.url(name)
+
+    def listdir(self, path):
+        return self.inner.listdir(path)
+
+    def get_accessed_time(self, name):
+        return self.inner.get_accessed_time(name)
+
+    def get_created_time(self, name):
+        return self.inner.get_created_time(name)
+
+    def get_modified_time(self, name):
+        return self.inner.get_modified_time(name)
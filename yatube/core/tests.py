@@ -1,4 +1,35 @@
-from django.test import TestCase
+import json
+import shutil
+import tempfile
+from importlib import import_module
+from unittest import mock, skipUnless
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.cache import page_cache
+from posts.content import ContentImporter
+from posts.models import Post, User
+from posts.moderation import delete_posts
+
+from . import ratelimit
+from .metrics import RequestMetrics
+from .middleware import PerformanceMiddleware
+from .models import StoredFile
+from .routers import ReplicaRouter, use_replica
+from .sqlite import write_lock
+from .storage import ContentAddressedStorage
 
 
 class ViewTestClass(TestCase):
@@ -6,3 +37,362 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         # Проверьте, что статус ответа сервера - 404
         # Проверьте, что используется шаблон core/404.html
+
+
+@override_settings(PERF_METRICS_ENABLED=True, PERF_SAMPLE_RATE=1.0)
+class PerformanceMiddlewareTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='post_author')
+        Post.objects.create(text='Текст', author=self.user)
+        page_cache().clear()
+
+    @override_settings(DEBUG=True)
+    def test_server_timing_header(self):
+        """Ответ несёт время запроса, SQL и шаблонов."""
+        with CaptureQueriesContext(connection) as queries:
+            response = Client().get(reverse('posts:index'))
+        timing = response['Server-Timing']
+        self.assertIn('total;dur=', timing)
+        self.assertIn(f'desc="{len(queries)} queries"', timing)
+        self.assertRegex(timing, r'tpl;dur=(?!0\.0)')
+
+    @override_settings(DEBUG=False)
+    def test_server_timing_only_for_staff(self):
+        """Без DEBUG заголовок видит только персонал."""
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.user.is_staff = True
+        self.user.save()
+        response = client.get(reverse('posts:index'))
+        self.assertTrue(response.has_header('Server-Timing'))
+
+    @override_settings(PERF_SLOW_REQUEST_MS=0)
+    def test_slow_request_logs_queries(self):
+        with self.assertLogs('yatube.performance', 'WARNING') as logs:
+            Client().get(reverse('posts:index'))
+        self.assertIn('status=200', logs.output[0])
+        self.assertIn('posts_post', logs.output[0])
+
+    def test_keeps_slowest_queries(self):
+        """В лог попадают самые долгие запросы, а не первые."""
+        metrics = RequestMetrics(max_queries=2)
+        durations = iter([0, 1.0, 0, 0.5, 0, 2.0, 0, 0.1])
+        with mock.patch('core.metrics.time.perf_counter',
+                        lambda: next(durations)):
+            for sql in ('a', 'b', 'c', 'd'):
+                metrics.execute_wrapper(
+                    lambda *args: None, sql, None, False, None
+                )
+        self.assertEqual(metrics.sql_count, 4)
+        self.assertEqual(sorted(metrics.queries, reverse=True),
+                         [(2.0, 'c'), (1.0, 'a')])
+
+    @override_settings(PERF_SAMPLE_RATE=0, DEBUG=True)
+    def test_unsampled_request(self):
+        response = Client().get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    @override_settings(PERF_METRICS_ENABLED=False)
+    def test_disabled(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            PerformanceMiddleware(lambda request: None)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='post_author')
+        self.post = Post.objects.create(text='Текст', author=self.user)
+        self.client = Client()
+        self.client.force_login(self.user)
+        # Реплика в тестах — та же база default.
+        patcher = mock.patch.object(
+            ReplicaRouter, 'choose_replica', return_value='default'
+        )
+        self.choose_replica = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_read_views_use_replica(self):
+        self.client.get(reverse('posts:index'))
+        self.assertTrue(self.choose_replica.called)
+
+    def test_other_views_use_primary(self):
+        self.client.get(reverse('posts:post_create'))
+        self.assertFalse(self.choose_replica.called)
+
+    def test_reads_pinned_after_write(self):
+        """После записи посетитель читает из default."""
+        response = self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            {'text': 'Комментарий'},
+        )
+        self.assertIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+        self.choose_replica.reset_mock()
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        self.assertFalse(self.choose_replica.called)
+        self.assertContains(response, 'Комментарий')
+
+    def test_sessions_read_from_primary(self):
+        use_replica(True)
+        self.addCleanup(use_replica, False)
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Session), 'default')
+        self.assertEqual(router.db_for_read(Post), 'default')
+        self.assertTrue(self.choose_replica.called)
+
+
+class SQLiteTuningTests(TestCase):
+    @skipUnless(connection.vendor == 'sqlite', 'PRAGMA из SQLite')
+    def test_new_connection_gets_pragmas(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(
+                cursor.fetchone()[0], settings.SQLITE_PRAGMAS['busy_timeout']
+            )
+            cursor.execute('PRAGMA synchronous')
+            # NORMAL
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_write_lock_is_atomic(self):
+        with self.assertRaises(ValueError):
+            with write_lock():
+                User.objects.create_user(username='rolled_back')
+                raise ValueError
+        self.assertFalse(User.objects.filter(username='rolled_back'))
+
+
+@override_settings(RATELIMITS={
+    'add_comment': {'user': '2/m', 'ip': '3/m'},
+})
+class RateLimitTests(TestCase):
+    def setUp(self):
+        # Корзины общие для всех тестов процесса.
+        for clear in (caches[settings.RATELIMIT_CACHE].clear,
+                      ratelimit._local_buckets.clear):
+            clear()
+            self.addCleanup(clear)
+        self.user = User.objects.create_user(username='post_author')
+        self.post = Post.objects.create(text='Текст', author=self.user)
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.url = reverse(
+            'posts:add_comment', kwargs={'post_id': self.post.pk}
+        )
+
+    def comment(self, client, **extra):
+        return client.post(self.url, {'text': 'Комментарий'}, **extra)
+
+    def test_user_limit(self):
+        """Сверх лимита пользователя — 429 без новой записи."""
+        for _ in range(2):
+            self.assertEqual(self.comment(self.client).status_code, 302)
+        response = self.comment(self.client)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertTemplateUsed(response, 'core/429.html')
+        self.assertEqual(self.post.comments.count(), 2)
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+    def test_ip_limit_shared_by_users(self):
+        for username in ('first', 'second'):
+            client = Client()
+            client.force_login(User.objects.create_user(username=username))
+            for _ in range(2):
+                response = self.comment(client)
+        self.assertEqual(response.status_code, 429)
+
+    @override_settings(RATELIMITS={
+        'add_comment': {'user': '2/m', 'ip': '1/m'},
+    })
+    def test_rejected_request_keeps_other_tokens(self):
+        """Отказ по IP не тратит токен пользователя."""
+        first = {'REMOTE_ADDR': '10.0.0.1'}
+        self.assertEqual(self.comment(self.client, **first).status_code, 302)
+        self.assertEqual(self.comment(self.client, **first).status_code, 429)
+        response = self.comment(self.client, REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(response.status_code, 302)
+
+    def test_client_ip_behind_trusted_proxy(self):
+        factory = RequestFactory()
+        forwarded = '1.1.1.1, 2.2.2.2, 10.0.0.2'
+        direct = factory.get(
+            '/', REMOTE_ADDR='3.3.3.3', HTTP_X_FORWARDED_FOR=forwarded
+        )
+        proxied = factory.get(
+            '/', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR=forwarded
+        )
+        with override_settings(
+            RATELIMIT_TRUSTED_PROXIES=('10.0.0.1', '10.0.0.2')
+        ):
+            self.assertEqual(ratelimit.client_ip(direct), '3.3.3.3')
+            self.assertEqual(ratelimit.client_ip(proxied), '2.2.2.2')
+        self.assertEqual(ratelimit.client_ip(proxied), '10.0.0.1')
+
+    def test_bucket_refills(self):
+        key = 'ratelimit:test:user:1'
+        self.assertEqual(ratelimit.take(key, '2/s', now=100), 0)
+        self.assertEqual(ratelimit.take(key, '2/s', now=100), 0)
+        self.assertEqual(ratelimit.take(key, '2/s', now=100), 0.5)
+        self.assertEqual(ratelimit.take(key, '2/s', now=100.5), 0)
+
+    def test_local_fallback_when_cache_fails(self):
+        """Без кеша корзины живут в памяти процесса."""
+        cache = caches[settings.RATELIMIT_CACHE]
+        with mock.patch.object(cache, 'get', side_effect=ConnectionError):
+            for _ in range(2):
+                self.comment(self.client)
+            self.assertEqual(self.comment(self.client).status_code, 429)
+        self.assertTrue(ratelimit._local_buckets)
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        # Локальная замена S3: то же API Storage поверх папки.
+        self.inner = FileSystemStorage(location=self.root)
+        self.storage = ContentAddressedStorage(self.inner)
+
+    def test_same_content_stored_once(self):
+        first = self.storage.save('posts/a.JPG', ContentFile(b'image'))
+        second = self.storage.save('posts/b.jpg', ContentFile(b'image'))
+        other = self.storage.save('posts/a.jpg', ContentFile(b'other'))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertRegex(
+            first, r'^posts/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$'
+        )
+        directory = first.rsplit('/', 1)[0]
+        self.assertEqual(len(self.inner.listdir(directory)[1]), 1)
+        self.assertEqual(StoredFile.objects.get(name=first).references, 2)
+
+    def test_file_deleted_with_last_reference(self):
+        name = self.storage.save('posts/a.jpg', ContentFile(b'image'))
+        self.storage.save('posts/b.jpg', ContentFile(b'image'))
+        self.storage.delete(name)
+        self.assertTrue(self.inner.exists(name))
+        self.storage.delete(name)
+        self.assertFalse(self.inner.exists(name))
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
+
+    def test_untracked_file_deleted(self):
+        name = self.inner.save('posts/old.jpg', ContentFile(b'image'))
+        self.storage.delete(name)
+        self.assertFalse(self.inner.exists(name))
+
+    def test_retain_survives_concurrent_create(self):
+        """Строку файла успел создать другой процесс: ссылка не теряется."""
+        name = self.storage.save('posts/a.jpg', ContentFile(b'image'))
+        real_update = QuerySet.update
+        calls = []
+
+        def update(queryset, **kwargs):
+            calls.append(kwargs)
+            # Первый UPDATE «не видит» строку параллельного процесса.
+            return 0 if len(calls) == 1 else real_update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', update):
+            self.storage.retain(name)
+        self.assertEqual(StoredFile.objects.get(name=name).references, 2)
+
+    def test_delete_keeps_concurrent_reference(self):
+        """Ссылка, добавленная между шагами delete(), сохраняет файл."""
+        name = self.storage.save('posts/a.jpg', ContentFile(b'image'))
+        real_update = QuerySet.update
+        calls = []
+
+        def update(queryset, **kwargs):
+            calls.append(kwargs)
+            if len(calls) == 1:
+                # Пока delete() проверял ссылки, другой процесс
+                # сохранил ту же картинку.
+                self.storage.retain(name)
+                return 0
+            return real_update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', update):
+            self.storage.delete(name)
+        self.assertTrue(self.inner.exists(name))
+        self.assertEqual(StoredFile.objects.get(name=name).references, 1)
+
+    def test_save_restores_file_deleted_before_retain(self):
+        """Файл удалили между сохранением и подсчётом ссылки."""
+        name = self.storage.save('posts/a.jpg', ContentFile(b'image'))
+        real_retain = self.storage.retain
+
+        def retain(name, **kwargs):
+            # Другой процесс отпускает последнюю ссылку.
+            self.storage.delete(name)
+            real_retain(name, **kwargs)
+
+        with mock.patch.object(self.storage, 'retain', retain):
+            self.storage.save('posts/b.jpg', ContentFile(b'image'))
+        self.assertTrue(self.inner.exists(name))
+        self.assertEqual(StoredFile.objects.get(name=name).references, 1)
+
+    @mock.patch('posts.signals.transaction.on_commit', lambda func: func())
+    def test_posts_share_uploaded_image(self):
+        with override_settings(MEDIA_ROOT=self.root):
+            user = User.objects.create_user(username='post_author')
+            posts = [
+                Post.objects.create(
+                    text='Пост', author=user, image=SimpleUploadedFile(
+                        'small.gif', b'GIF89a', content_type='image/gif'
+                    )
+                )
+                for _ in range(2)
+            ]
+            name = posts[0].image.name
+            self.assertEqual(posts[1].image.name, name)
+            posts[0].delete()
+            self.assertTrue(default_storage.exists(name))
+            posts[1].delete()
+            self.assertFalse(default_storage.exists(name))
+
+    @mock.patch('posts.signals.transaction.on_commit', lambda func: func())
+    def test_untracked_image_shared_by_posts(self):
+        """Файл, сохранённый до подсчёта ссылок, живёт, пока на него
+        ссылается хоть один пост."""
+        with override_settings(MEDIA_ROOT=self.root):
+            user = User.objects.create_user(username='post_author')
+            name = default_storage.inner.save(
+                'posts/old.gif', ContentFile(b'GIF89a')
+            )
+            posts = [
+                Post.objects.create(text='Пост', author=user)
+                for _ in range(3)
+            ]
+            Post.objects.update(image=name)
+            Post.objects.get(pk=posts[0].pk).delete()
+            self.assertTrue(default_storage.exists(name))
+            delete_posts(Post.objects.filter(pk=posts[1].pk))
+            self.assertTrue(default_storage.exists(name))
+            delete_posts(Post.objects.all())
+            self.assertFalse(default_storage.exists(name))
+
+    def test_migration_counts_post_files(self):
+        user = User.objects.create_user(username='post_author')
+        for image in ('posts/a.gif', 'posts/a.gif', 'posts/b.gif'):
+            Post.objects.create(
+                text='Пост', author=user, image=image,
+                image_variants=json.dumps([{'name': 'posts/a.webp'}]),
+            )
+        StoredFile.objects.create(name='posts/b.gif', references=5)
+        migration = import_module('core.migrations.0002_count_post_files')
+        migration.count_post_files(apps, None)
+        self.assertEqual(
+            dict(StoredFile.objects.values_list('name', 'references')),
+            {'posts/a.gif': 2, 'posts/b.gif': 1, 'posts/a.webp': 3},
+        )
+
+    def test_import_counts_earlier_references(self):
+        user = User.objects.create_user(username='post_author')
+        Post.objects.create(text='Пост', author=user, image='posts/a.gif')
+        Post.objects.create(text='Пост', author=user, image='posts/a.gif')
+        with mock.patch.object(default_storage, 'retain') as retain:
+            ContentImporter.retain_images(['posts/a.gif'])
+        retain.assert_called_once_with('posts/a.gif', 2)
@@ -16,4 +16,15 @@ def permission_denied(request, exception):
 
 
 def csrf_failure(request, reason=''):
-    return render(request, 'core/403csrf.html')
\ No newline at end of file
+    return render(request, 'core/403csrf.html')
+
+
+def too_many_requests(request, exception):
+    response = render(
+        request,
+        'core/429.html',
+        {'retry_after': exception.retry_after},
+        status=429,
+    )
+    response['Retry-After'] = exception.retry_after
+    return response
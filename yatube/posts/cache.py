@@ -0,0 +1,292 @@
+import hashlib
+import time
+from collections import namedtuple
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils import timezone
+from django.utils.http import http_date, quote_etag
+from django.utils.safestring import mark_safe
+
+from core.sqlite import write_lock
+
+from .models import Group, ListingVersion
+
+POST_CARD_TEMPLATE = 'includes/post_card.html'
+POST_CARD_KEY = 'post_card:{}'
+INVALIDATE_BATCH = 500
+
+PAGE_KEY = 'page:{}:{}:{}'
+# Параметры запроса, от которых зависит страница ленты: остальные
+# не попадают в ключ и не плодят копий одной страницы в кеше.
+PAGE_PARAMS = ('cursor', 'page')
+INDEX_LISTING = 'index'
+GROUP_LISTING = 'group:{}'
+PROFILE_LISTING = 'profile:{}'
+
+GROUP_HEADER_KEY = 'group_header:{}'
+GroupHeader = namedtuple(
+    'GroupHeader', 'id slug title description posts_count last_activity'
+)
+
+
+def post_card_cache():
+    return caches[settings.POST_CARD_CACHE]
+
+
+def post_card_version(post):
+    """Версия карточки: всё, что в ней видно, кроме самого поста.
+
+    Правку поста видно по Post.updated, а имя автора, название группы
+    и число комментариев берутся из строки ленты. Поэтому карточку
+    из кеша другого процесса не покажут после переименования: сигналы
+    сбрасывают карточки только в кеше своего процесса.
+    """
+    return (
+        post.updated.timestamp(),
+        getattr(post, 'comment_count', None),
+        post.author.get_full_name(),
+        post.group.title if post.group_id else None,
+    )
+
+
+def render_post_cards(posts):
+    """Пары (пост, HTML карточки) для страницы ленты.
+
+    Карточки читаются из кеша одним get_many, устаревшие и отсутствующие
+    рендерятся заново и записываются одним set_many.
+    """
+    cache = post_card_cache()
+    keys = {post.pk: POST_CARD_KEY.format(post.pk) for post in posts}
+    cached = cache.get_many(keys.values())
+    cards, rendered = [], {}
+    for post in posts:
+        version = post_card_version(post)
+        cached_version, html = cached.get(keys[post.pk], (None, None))
+        if cached_version != version:
+            html = render_to_string(POST_CARD_TEMPLATE, {'post': post})
+            rendered[keys[post.pk]] = (version, str(html))
+        cards.append((post, mark_safe(html)))
+    if rendered:
+        cache.set_many(rendered)
+    return cards
+
+
+def invalidate_post_cards(post_ids):
+    """Сбросить карточки постов; post_ids может быть ленивым итератором."""
+    cache = post_card_cache()
+    batch = []
+    for post_id in post_ids:
+        batch.append(POST_CARD_KEY.format(post_id))
+        if len(batch) >= INVALIDATE_BATCH:
+            cache.delete_many(batch)
+            batch = []
+    if batch:
+        cache.delete_many(batch)
+
+
+def group_header_cache():
+    return caches[settings.GROUP_HEADER_CACHE]
+
+
+def load_group_headers(groups):
+    """Шапки групп из базы одним запросом, ключи — ключи кеша."""
+    rows = groups.values_list(
+        'id', 'slug', 'title', 'description',
+        'stats__posts_count', 'stats__last_activity',
+    )
+    headers = {}
+    for pk, slug, title, description, posts_count, last_activity in rows:
+        headers[GROUP_HEADER_KEY.format(slug)] = GroupHeader(
+            pk, slug, title, description, posts_count or 0, last_activity
+        )
+    return headers
+
+
+def group_header(slug, version=None):
+    """Шапка группы: поля группы, число постов и последняя публикация.
+
+    Сигналы постов и групп перезаписывают её при каждом изменении,
+    но только в кеше своего процесса. Поэтому шапка запоминается
+    с версией ленты группы ``version``: переименование, удаление
+    группы и её посты меняют версию, и шапку с другой версией читают
+    из базы заново. Без ``version`` подойдёт любая закешированная.
+    None — группы нет.
+    """
+    cache = group_header_cache()
+    key = GROUP_HEADER_KEY.format(slug)
+    cached = cache.get(key)
+    if cached is not None and version in (None, cached[0]):
+        return cached[1]
+    header = load_group_headers(Group.objects.filter(slug=slug)).get(key)
+    if header is not None:
+        cache.set(key, (version, header), settings.GROUP_HEADER_CACHE_TIMEOUT)
+    return header
+
+
+def refresh_group_headers(group_ids):
+    # Версия ленты меняется позже, в том же сохранении: шапка без версии.
+    headers = load_group_headers(Group.objects.filter(pk__in=group_ids))
+    group_header_cache().set_many(
+        {key: (None, header) for key, header in headers.items()},
+        settings.GROUP_HEADER_CACHE_TIMEOUT,
+    )
+
+
+def forget_group_header(slug):
+    group_header_cache().delete(GROUP_HEADER_KEY.format(slug))
+
+
+def page_cache():
+    return caches[settings.PAGE_CACHE]
+
+
+def listing_versions(listings):
+    """Версии лент — время их последнего изменения в секундах.
+
+    Хранятся в базе, а не в кеше процесса: правку в одном процессе
+    сразу видят остальные. 0 — ленту ещё не меняли.
+    """
+    changed = dict(ListingVersion.objects.filter(
+        name__in=listings
+    ).values_list('name', 'changed'))
+    return [
+        changed[name].timestamp() if name in changed else 0
+        for name in listings
+    ]
+
+
+def listing_version(listing, request=None):
+    """Версия ленты; с ``request`` — одна на запрос.
+
+    Версию спрашивают и conditional_page, и cache_anonymous_page:
+    запомненная в запросе читается из базы один раз.
+    """
+    if request is None:
+        return listing_versions([listing])[0]
+    versions = request.__dict__.setdefault('_listing_versions', {})
+    if listing not in versions:
+        versions[listing] = listing_versions([listing])[0]
+    return versions[listing]
+
+
+def touch_listings(listings):
+    """Пометить ленты изменёнными: их закешированные страницы устаревают.
+
+    Обычно это один UPDATE: строки создаются, только если каких-то
+    лент ещё нет.
+    """
+    listings = set(listings)
+    now = timezone.now()
+    with write_lock():
+        touched = ListingVersion.objects.filter(
+            name__in=listings
+        ).update(changed=now)
+        if touched < len(listings):
+            ListingVersion.objects.bulk_create(
+                [ListingVersion(name=name, changed=now) for name in listings],
+                ignore_conflicts=True,
+            )
+
+
+def is_cacheable(request, response):
+    # Ответ с cookie или использованным CSRF-токеном принадлежит
+    # конкретному посетителю и не должен достаться другим.
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not request.META.get('CSRF_COOKIE_USED')
+    )
+
+
+def page_key(request):
+    params = [
+        (param, request.GET[param])
+        for param in PAGE_PARAMS if param in request.GET
+    ]
+    return hashlib.md5(f'{request.path}?{params}'.encode()).hexdigest()
+
+
+def cache_anonymous_page(view_name, listing):
+    """Кешировать страницу ленты целиком для анонимных посетителей.
+
+    ``listing`` получает аргументы представления и возвращает имя ленты;
+    страницы ленты сбрасываются вместе через ``touch_listings``.
+    Время жизни задаётся в ``settings.PAGE_CACHE_TIMEOUTS[view_name]``.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (request.method not in ('GET', 'HEAD')
+                    or request.user.is_authenticated):
+                return view(request, *args, **kwargs)
+            name = listing(*args, **kwargs)
+            key = PAGE_KEY.format(
+                name, listing_version(name, request), page_key(request)
+            )
+            cache = page_cache()
+            response = cache.get(key)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if is_cacheable(request, response):
+                    cache.set(
+                        key, response, settings.PAGE_CACHE_TIMEOUTS[view_name]
+                    )
+            return response
+        return wrapper
+    return decorator
+
+
+def page_validators(request, versions, *extra):
+    """ETag и Last-Modified страницы по версиям её данных.
+
+    ``versions`` — времена изменения данных страницы в секундах,
+    ``extra`` — прочее, от чего зависит страница. ETag зависит ещё
+    и от посетителя: в шапке его имя, в формах его CSRF-токен.
+    """
+    key = ':'.join(map(str, (request.user.pk, *versions, *extra)))
+    return hashlib.md5(key.encode()).hexdigest(), max(versions)
+
+
+def conditional_page(validators):
+    """Отвечать 304 Not Modified, не вызывая представление.
+
+    ``validators`` получает запрос и аргументы представления
+    и возвращает результат ``page_validators`` или None, если
+    страницы нет. Браузер и CDN перепроверяют страницу при каждом
+    показе (no-cache), страницы посетителей с входом — private.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            result = validators(request, *args, **kwargs)
+            if result is None:
+                return view(request, *args, **kwargs)
+            etag, last_modified = quote_etag(result[0]), int(result[1])
+            if not last_modified or time.time() < last_modified + 1:
+                # Last-Modified точен до секунды: страница может ещё
+                # измениться в ту же секунду, и If-Modified-Since с этим
+                # временем вернул бы 304 на новую версию. Хватит ETag.
+                last_modified = None
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is None:
+                response = view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response['ETag'] = etag
+                if last_modified is not None:
+                    response['Last-Modified'] = http_date(last_modified)
+                if request.user.is_authenticated:
+                    patch_cache_control(response, no_cache=True, private=True)
+                else:
+                    patch_cache_control(response, no_cache=True)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,374 @@
+"""Потоковый импорт и экспорт постов, групп и комментариев.
+
+Записи — плоские словари с полем ``model``; авторы и группы
+указываются по username и slug. Формат JSONL — запись на строку,
+CSV — общая шапка ``CSV_FIELDS`` для всех моделей.
+"""
+import csv
+import json
+from collections import Counter
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.storage import default_storage
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Case, Count, DateTimeField, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.models import StoredFile
+
+from .cache import group_header_cache, page_cache, post_card_cache
+from .models import AuthorStats, Comment, Group, GroupStats, Post, User
+from .search import get_backend as get_search_backend
+from .timeline import refresh_followers
+
+FORMATS = ('jsonl', 'csv')
+CSV_FIELDS = (
+    'model', 'id', 'slug', 'title', 'description', 'text', 'author',
+    'group', 'image', 'post', 'pub_date', 'created',
+)
+DEFAULT_CHUNK_SIZE = 1000
+# Сколько username и slug помнить между пачками: больше — словари
+# сбрасываются, и id догружаются заново по пачке.
+LOOKUP_CACHE_SIZE = 100000
+
+
+def guess_format(path):
+    return 'csv' if path.endswith('.csv') else 'jsonl'
+
+
+def write_records(stream, records, fmt):
+    """Записать записи в поток, вернуть их число."""
+    if fmt == 'csv':
+        writer = csv.DictWriter(stream, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        write = writer.writerow
+    else:
+        def write(record):
+            stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+    written = 0
+    for written, record in enumerate(records, 1):
+        write(record)
+    return written
+
+
+def read_records(stream, fmt):
+    if fmt == 'csv':
+        for row in csv.DictReader(stream):
+            # Пустые ячейки CSV — отсутствующие значения.
+            yield {key: value for key, value in row.items() if value != ''}
+        return
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+def export_records(models, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Записи для экспорта: группы, затем посты, затем комментарии.
+
+    Строки читаются через values() и iterator(), без моделей
+    и без загрузки таблицы в память.
+    """
+    if 'groups' in models:
+        groups = Group.objects.order_by('pk').values(
+            'slug', 'title', 'description'
+        )
+        for group in groups.iterator(chunk_size=chunk_size):
+            yield dict(model='group', **group)
+    if 'posts' in models:
+        posts = Post.objects.order_by('pk').values_list(
+            'pk', 'text', 'author__username', 'group__slug', 'image',
+            'pub_date',
+        )
+        for pk, text, author, group, image, pub_date in posts.iterator(
+            chunk_size=chunk_size
+        ):
+            yield {
+                'model': 'post',
+                'id': pk,
+                'text': text,
+                'author': author,
+                'group': group,
+                'image': image,
+                'pub_date': isoformat(pub_date),
+            }
+    if 'comments' in models:
+        comments = Comment.objects.order_by('pk').values_list(
+            'post_id', 'author__username', 'text', 'created'
+        )
+        for post, author, text, created in comments.iterator(
+            chunk_size=chunk_size
+        ):
+            yield {
+                'model': 'comment',
+                'post': post,
+                'author': author,
+                'text': text,
+                'created': isoformat(created),
+            }
+
+
+def parse_id(value):
+    """Целый id из записи; None, если его нет или это не число."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_date(value):
+    """Дата из записи или сейчас; None — если дата невозможна."""
+    try:
+        return parse_datetime(value or '') or timezone.now()
+    except ValueError:
+        # Формат верный, но такой даты нет: 2020-13-45.
+        return None
+
+
+def bulk_create_with_dates(model, objs, dates, batch_size):
+    """bulk_create, который сохраняет даты из импорта.
+
+    auto_now и auto_now_add при вставке заменяют даты ``dates``
+    текущим временем, поэтому их возвращает UPDATE по id. Id новых
+    строк bulk_create проставляет сам, если база умеет их вернуть
+    (PostgreSQL). Иначе это последние строки таблицы: в SQLite
+    транзакция пачки держит блокировку записи до коммита, и чужих строк
+    после них нет.
+    """
+    values = [[getattr(obj, field) for field in dates] for obj in objs]
+    model.objects.bulk_create(objs, batch_size=batch_size)
+    # bulk_create вставляет строки без id после строк с id.
+    without_pk = [obj for obj in objs if obj.pk is None]
+    if without_pk:
+        ids = model.objects.order_by('-pk').values_list('pk', flat=True)
+        for obj, pk in zip(without_pk, reversed(list(ids[:len(without_pk)]))):
+            obj.pk = pk
+    rows = list(zip(objs, values))
+    for offset in range(0, len(rows), batch_size):
+        batch = rows[offset:offset + batch_size]
+        model.objects.filter(pk__in=[obj.pk for obj, _ in batch]).update(**{
+            field: Case(
+                *(When(pk=obj.pk, then=Value(row[index]))
+                  for obj, row in batch),
+                output_field=DateTimeField(),
+            )
+            for index, field in enumerate(dates)
+        })
+
+
+class ContentImporter:
+    """Импорт записей пачками по ``chunk_size`` через bulk_create.
+
+    Каждая пачка — отдельная транзакция. Авторы и группы ищутся через
+    словари username -> id и slug -> id, которые догружаются одним
+    запросом на пачку и не растут больше ``LOOKUP_CACHE_SIZE``.
+    Сигналы моделей при bulk_create не срабатывают, поэтому счётчики,
+    поисковый индекс, ленты и кеши пересобираются в ``finish()``.
+    """
+
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE, create_authors=False):
+        self.chunk_size = chunk_size
+        self.create_authors = create_authors
+        self.author_ids = {}
+        self.group_ids = {}
+        self.imported_authors = set()
+        self.counts = {'group': 0, 'post': 0, 'comment': 0, 'skipped': 0}
+
+    def run(self, records):
+        records = iter(records)
+        while True:
+            chunk = list(islice(records, self.chunk_size))
+            if not chunk:
+                break
+            with transaction.atomic():
+                self.import_chunk(chunk)
+            yield self.counts
+
+    def import_chunk(self, chunk):
+        for lookup in (self.author_ids, self.group_ids):
+            if len(lookup) > LOOKUP_CACHE_SIZE:
+                lookup.clear()
+        by_model = {'group': [], 'post': [], 'comment': []}
+        for record in chunk:
+            if record.get('model') in by_model:
+                by_model[record['model']].append(record)
+            else:
+                self.counts['skipped'] += 1
+        self.import_groups(by_model['group'])
+        self.resolve_authors(
+            record.get('author')
+            for record in by_model['post'] + by_model['comment']
+        )
+        self.resolve_groups(record.get('group') for record in by_model['post'])
+        self.import_posts(by_model['post'])
+        self.import_comments(by_model['comment'])
+
+    def resolve_authors(self, usernames):
+        missing = {
+            name for name in usernames
+            if name and name not in self.author_ids
+        }
+        if not missing:
+            return
+        self.author_ids.update(
+            User.objects.filter(username__in=missing)
+            .values_list('username', 'pk')
+        )
+        missing -= self.author_ids.keys()
+        if missing and self.create_authors:
+            password = make_password(None)
+            User.objects.bulk_create(
+                [User(username=name, password=password) for name in missing],
+                batch_size=self.chunk_size,
+            )
+            self.author_ids.update(
+                User.objects.filter(username__in=missing)
+                .values_list('username', 'pk')
+            )
+
+    def resolve_groups(self, slugs):
+        missing = {
+            slug for slug in slugs if slug and slug not in self.group_ids
+        }
+        if missing:
+            self.group_ids.update(
+                Group.objects.filter(slug__in=missing)
+                .values_list('slug', 'pk')
+            )
+
+    def import_groups(self, records):
+        self.resolve_groups(record.get('slug') for record in records)
+        groups = {}
+        for record in records:
+            slug = record.get('slug')
+            if not slug or slug in self.group_ids or slug in groups:
+                self.counts['skipped'] += 1
+                continue
+            groups[slug] = Group(
+                slug=slug,
+                title=record.get('title', slug),
+                description=record.get('description', ''),
+            )
+        Group.objects.bulk_create(groups.values())
+        self.counts['group'] += len(groups)
+        self.resolve_groups(groups)
+
+    def import_posts(self, records):
+        ids = {parse_id(record.get('id')) for record in records}
+        taken = set(Post.objects.filter(pk__in=ids - {None}).values_list(
+            'pk', flat=True
+        ))
+        posts = []
+        for record in records:
+            author_id = self.author_ids.get(record.get('author'))
+            post_id = parse_id(record.get('id'))
+            pub_date = parse_date(record.get('pub_date'))
+            if (author_id is None or not record.get('text')
+                    or pub_date is None
+                    or (record.get('id') and post_id is None)
+                    or post_id in taken):
+                self.counts['skipped'] += 1
+                continue
+            if post_id is not None:
+                # Повтор id в самом файле — тоже конфликт.
+                taken.add(post_id)
+            post = Post(
+                id=post_id,
+                text=record['text'],
+                author_id=author_id,
+                group_id=self.group_ids.get(record.get('group')),
+                image=record.get('image') or '',
+            )
+            post.pub_date = post.updated = pub_date
+            posts.append(post)
+            self.remember_author(author_id)
+        bulk_create_with_dates(
+            Post, posts, ('pub_date', 'updated'), self.chunk_size
+        )
+        self.counts['post'] += len(posts)
+        self.retain_images(post.image.name for post in posts)
+
+    def remember_author(self, author_id):
+        """Запомнить автора, чьим подписчикам дозаполнить ленты.
+
+        None — авторов слишком много: дозаполняются ленты всех подписок.
+        """
+        if self.imported_authors is None:
+            return
+        self.imported_authors.add(author_id)
+        if len(self.imported_authors) > LOOKUP_CACHE_SIZE:
+            self.imported_authors = None
+
+    @staticmethod
+    def retain_images(names):
+        """Учесть ссылки импортированных постов на файлы картинок."""
+        # Только у хранилища со счётчиками ссылок (core.storage).
+        retain = getattr(default_storage, 'retain', None)
+        if retain is None:
+            return
+        counts = Counter(filter(None, names))
+        untracked = set(counts) - set(StoredFile.objects.filter(
+            name__in=set(counts)
+        ).values_list('name', flat=True))
+        # Файл без счётчика сохранён до подсчёта ссылок, и на него могут
+        # ссылаться прежние посты: считаются все, импортированные уже
+        # в базе.
+        totals = Post.objects.filter(image__in=untracked).order_by()
+        for name, total in totals.values_list('image').annotate(Count('pk')):
+            counts[name] = total
+        for name, count in counts.items():
+            retain(name, count)
+
+    def import_comments(self, records):
+        post_ids = set(
+            Post.objects.filter(
+                pk__in={parse_id(record.get('post')) for record in records}
+                - {None}
+            ).values_list('pk', flat=True)
+        )
+        comments = []
+        for record in records:
+            author_id = self.author_ids.get(record.get('author'))
+            post_id = parse_id(record.get('post'))
+            created = parse_date(record.get('created'))
+            if (author_id is None or post_id not in post_ids
+                    or not record.get('text') or created is None):
+                self.counts['skipped'] += 1
+                continue
+            comment = Comment(
+                post_id=post_id,
+                author_id=author_id,
+                text=record['text'],
+            )
+            comment.created = created
+            comments.append(comment)
+        bulk_create_with_dates(
+            Comment, comments, ('created',), self.chunk_size
+        )
+        self.counts['comment'] += len(comments)
+
+    def finish(self):
+        """Пересобрать то, что обычно поддерживают сигналы."""
+        with connection.cursor() as cursor:
+            # Посты вставлены со своими id: последовательность догоняет их.
+            for statement in connection.ops.sequence_reset_sql(
+                no_style(), [Group, Post, Comment]
+            ):
+                cursor.execute(statement)
+        with transaction.atomic():
+            AuthorStats.rebuild()
+            GroupStats.rebuild()
+            get_search_backend().rebuild()
+        if self.imported_authors is None:
+            refresh_followers(User.objects.values('pk'))
+        else:
+            refresh_followers(self.imported_authors)
+        post_card_cache().clear()
+        page_cache().clear()
+        group_header_cache().clear()
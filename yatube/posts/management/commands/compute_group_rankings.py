@@ -0,0 +1,37 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from posts.rankings import compute_rankings
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает места групп по активности за окна времени.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--windows',
+            nargs='+',
+            choices=list(settings.GROUP_RANKING_WINDOWS),
+            help='Какие окна пересчитать (по умолчанию все).',
+        )
+        parser.add_argument(
+            '--loop',
+            type=int,
+            metavar='SECONDS',
+            help='Пересчитывать каждые SECONDS секунд, пока не прервут.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            groups = compute_rankings(options['windows'])
+            self.stdout.write(
+                self.style.SUCCESS(f'Места посчитаны для {groups} групп')
+            )
+            if not options['loop']:
+                return
+            time.sleep(options['loop'])
+            # Долгоживущий процесс: соединение не должно устареть.
+            close_old_connections()
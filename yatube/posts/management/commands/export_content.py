@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from posts.content import (DEFAULT_CHUNK_SIZE, FORMATS, export_records,
+                           guess_format, write_records)
+
+MODELS = ('groups', 'posts', 'comments')
+
+
+class Command(BaseCommand):
+    help = 'Выгружает группы, посты и комментарии в JSONL или CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл для выгрузки.')
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            help='Формат файла; по умолчанию по расширению.',
+        )
+        parser.add_argument(
+            '--models',
+            nargs='+',
+            choices=MODELS,
+            default=MODELS,
+            help='Что выгружать.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help='Сколько строк читать из базы за раз.',
+        )
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or guess_format(options['path'])
+        records = export_records(options['models'], options['chunk_size'])
+        with open(options['path'], 'w', encoding='utf-8',
+                  newline='') as stream:
+            exported = write_records(stream, records, fmt)
+        self.stdout.write(self.style.SUCCESS(f'Выгружено записей: {exported}'))
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import get_executor, run_thumbnail_job
+
+
+class Command(BaseCommand):
+    help = 'Делает недостающие миниатюры картинок постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Пересоздать миниатюры и для постов, где они уже есть.',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='')
+        if not options['all']:
+            posts = posts.filter(image_thumbnail='')
+        post_ids = posts.order_by('pk').values_list('pk', flat=True)
+        jobs = get_executor().map if settings.THUMBNAIL_ASYNC else map
+        done = 0
+        for name in jobs(run_thumbnail_job, post_ids.iterator()):
+            if name:
+                done += 1
+                if done % 100 == 0:
+                    self.stdout.write(f'Готово миниатюр: {done}')
+        self.stdout.write(self.style.SUCCESS(f'Готово миниатюр: {done}'))
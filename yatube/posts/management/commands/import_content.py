@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+
+from posts.content import (DEFAULT_CHUNK_SIZE, FORMATS, ContentImporter,
+                           guess_format, read_records)
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает группы, посты и комментарии из JSONL или CSV '
+        'пачками через bulk_create.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл с записями.')
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            help='Формат файла; по умолчанию по расширению.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help='Сколько записей вставлять в одной транзакции.',
+        )
+        parser.add_argument(
+            '--create-authors',
+            action='store_true',
+            help='Создавать неизвестных авторов без пароля '
+                 'вместо пропуска их записей.',
+        )
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or guess_format(options['path'])
+        importer = ContentImporter(
+            chunk_size=options['chunk_size'],
+            create_authors=options['create_authors'],
+        )
+        with open(options['path'], encoding='utf-8', newline='') as stream:
+            for counts in importer.run(read_records(stream, fmt)):
+                if options['verbosity'] > 1:
+                    self.stdout.write(self.format_counts(counts))
+        self.stdout.write('Пересборка счётчиков, поиска и лент...')
+        importer.finish()
+        self.stdout.write(self.style.SUCCESS(
+            self.format_counts(importer.counts)
+        ))
+        if importer.counts['post']:
+            self.stdout.write(
+                'Миниатюры картинок: manage.py generate_thumbnails'
+            )
+
+    @staticmethod
+    def format_counts(counts):
+        return (
+            'Групп: {group}, постов: {post}, комментариев: {comment}, '
+            'пропущено: {skipped}'.format(**counts)
+        )
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import AuthorStats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов авторов.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            authors = AuthorStats.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f'Счётчики пересчитаны для {authors} авторов')
+        )
@@ -0,0 +1,49 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:10
+
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE posts_post_fts USING fts5(text, "
+    "tokenize = 'unicode61 remove_diacritics 2')",
+    'INSERT INTO posts_post_fts (rowid, text) SELECT id, text FROM posts_post',
+]
+SQLITE_BACKWARD = ['DROP TABLE IF EXISTS posts_post_fts']
+
+POSTGRES_FORWARD = [
+    'CREATE TABLE posts_post_search ('
+    'post_id integer PRIMARY KEY '
+    'REFERENCES posts_post (id) ON DELETE CASCADE, '
+    'document tsvector NOT NULL)',
+    'CREATE INDEX posts_post_search_document_idx '
+    'ON posts_post_search USING GIN (document)',
+    "INSERT INTO posts_post_search (post_id, document) "
+    "SELECT id, to_tsvector('russian', text) FROM posts_post",
+]
+POSTGRES_BACKWARD = ['DROP TABLE IF EXISTS posts_post_search']
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_post_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor({
+                'sqlite': SQLITE_FORWARD,
+                'postgresql': POSTGRES_FORWARD,
+            }),
+            run_for_vendor({
+                'sqlite': SQLITE_BACKWARD,
+                'postgresql': POSTGRES_BACKWARD,
+            }),
+        ),
+    ]
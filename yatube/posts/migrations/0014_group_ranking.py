@@ -0,0 +1,39 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_group_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupRanking',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window', models.CharField(max_length=16, verbose_name='Окно')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Постов за окно')),
+                ('comments_count', models.PositiveIntegerField(default=0, verbose_name='Комментариев за окно')),
+                ('score', models.FloatField(default=0, verbose_name='Активность')),
+                ('rank', models.PositiveIntegerField(verbose_name='Место')),
+                ('computed_at', models.DateTimeField(verbose_name='Посчитано')),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rankings', to='posts.Group', verbose_name='Группа')),
+            ],
+            options={
+                'verbose_name': 'Место группы',
+                'verbose_name_plural': 'Места групп',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='groupranking',
+            index=models.Index(fields=['window', 'rank'], name='group_ranking_window_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='groupranking',
+            constraint=models.UniqueConstraint(fields=('group', 'window'), name='unique_group_ranking'),
+        ),
+    ]
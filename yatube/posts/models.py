@@ -1,18 +1,65 @@
+import json
+
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, models, transaction
+from django.db.models import (Count, F, IntegerField, Max, OuterRef, Q,
+                              Subquery)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
 User = get_user_model()
 
+# Поля, которые карточки постов в лентах не показывают.
+FEED_DEFERRED_FIELDS = (
+    'author__password',
+    'author__last_login',
+    'author__is_superuser',
+    'author__email',
+    'author__is_staff',
+    'author__is_active',
+    'author__date_joined',
+    'group__description',
+)
+
 
 class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField()
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        group = super().from_db(db, field_names, values)
+        # Адрес на момент загрузки: по нему сбрасывается старая шапка.
+        group._loaded_slug = group.__dict__.get('slug')
+        return group
+
     def __str__(self):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты для лент: автор и группа в одном запросе
+        и число комментариев без отдельного запроса на карточку."""
+        comments = (
+            Comment.objects
+            .filter(post=OuterRef('pk'))
+            .order_by()
+            .values('post')
+            .annotate(count=Count('pk'))
+            .values('count')
+        )
+        return (
+            self.select_related('author', 'group')
+            .defer(*FEED_DEFERRED_FIELDS)
+            .annotate(comment_count=Coalesce(
+                Subquery(comments, output_field=IntegerField()), 0
+            ))
+        )
+
+
 class Post(models.Model):
     text = models.TextField(
         'Текст поста',
@@ -22,6 +69,10 @@ class Post(models.Model):
         'Дата публикации',
         auto_now_add=True
     )
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -43,12 +94,100 @@ class Post(models.Model):
         help_text='Добавьте изображение',
         blank=True
     )
+    image_thumbnail = models.CharField(
+        'Миниатюра',
+        max_length=255,
+        blank=True,
+        editable=False,
+        help_text='Пусто, пока миниатюра не готова'
+    )
+    image_variants = models.TextField(
+        'Варианты картинки',
+        blank=True,
+        editable=False,
+        help_text='JSON: имя файла, ширина, высота и MIME-тип варианта'
+    )
+
+    objects = PostQuerySet.as_manager()
+
+    # Поля, прежние значения которых нужны сигналам при save():
+    # по автору и группе видно, из каких счётчиков и лент пост ушёл,
+    # прежнюю картинку отпускают при замене.
+    LOADED_FIELDS = {
+        'author_id': '_loaded_author_id',
+        'group_id': '_loaded_group_id',
+        'image': '_loaded_image',
+    }
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        post = super().from_db(db, field_names, values)
+        for field, attribute in cls.LOADED_FIELDS.items():
+            if field in post.__dict__:
+                setattr(post, attribute, post.__dict__[field])
+        return post
+
+    def load_original_values(self):
+        """Прежние значения полей, отложенных при загрузке.
+
+        После .only() и .defer() их нет в from_db: они читаются
+        из базы перед save(), пока строка ещё не перезаписана.
+        """
+        missing = [
+            field for field, attribute in self.LOADED_FIELDS.items()
+            if not hasattr(self, attribute)
+        ]
+        if self._state.adding or not missing:
+            return
+        values = type(self).objects.filter(pk=self.pk).values(
+            *missing
+        ).first() or {}
+        for field in missing:
+            setattr(self, self.LOADED_FIELDS[field], values.get(field))
 
     def __str__(self):
         return self.text[:15]
 
+    @property
+    def thumbnail_url(self):
+        if not self.image_thumbnail:
+            return ''
+        return default_storage.url(self.image_thumbnail)
+
+    @property
+    def variants(self):
+        try:
+            return json.loads(self.image_variants or '[]')
+        except ValueError:
+            return []
+
+    @property
+    def image_srcset(self):
+        """srcset по форматам ('webp', 'jpeg') из сохранённых вариантов."""
+        srcset = {}
+        for variant in self.variants:
+            subtype = variant['type'].split('/')[-1]
+            srcset.setdefault(subtype, []).append('{} {}w'.format(
+                default_storage.url(variant['name']), variant['width']
+            ))
+        return {subtype: ', '.join(urls) for subtype, urls in srcset.items()}
+
     class Meta:
-        ordering = ["-pub_date"]
+        ordering = ["-pub_date", "-id"]
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_pub_date_id_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx',
+            ),
+        ]
 
 
 class Comment(models.Model):
@@ -73,3 +212,375 @@ class Comment(models.Model):
 
     def __str__(self):
         return self.text[:15]
+
+    class Meta:
+        ordering = ['created', 'id']
+        indexes = [
+            models.Index(
+                fields=['post', 'created', 'id'],
+                name='comment_post_created_idx',
+            ),
+        ]
+
+
+class AuthorStats(models.Model):
+    """Денормализованные счётчики автора вместо COUNT(*) на каждой странице.
+
+    Поддерживаются сигналами из ``posts.signals``, пересобираются
+    командой ``manage.py rebuild_author_stats``.
+    """
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='post_stats',
+        verbose_name='Автор'
+    )
+    posts_count = models.PositiveIntegerField(
+        'Число постов',
+        default=0
+    )
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков',
+        default=0
+    )
+
+    class Meta:
+        verbose_name = 'Статистика автора'
+        verbose_name_plural = 'Статистика авторов'
+
+    def __str__(self):
+        return f'{self.author_id}: {self.posts_count}'
+
+    @classmethod
+    def change_counter(cls, author_id, field, delta):
+        """Сдвинуть счётчик автора на delta одним UPDATE."""
+        stats = cls.objects.filter(author_id=author_id)
+        if delta < 0:
+            stats = stats.filter(**{f'{field}__gte': -delta})
+        updated = stats.update(**{field: F(field) + delta})
+        if updated or delta < 0:
+            return
+        try:
+            # Точка сохранения: при гонке внешняя транзакция не ломается.
+            with transaction.atomic():
+                cls.objects.create(author_id=author_id, **{field: delta})
+        except IntegrityError:
+            # Строку только что создал параллельный запрос.
+            stats.update(**{field: F(field) + delta})
+
+    @classmethod
+    def change_posts_count(cls, author_id, delta):
+        cls.change_counter(author_id, 'posts_count', delta)
+
+    @classmethod
+    def change_followers_count(cls, author_id, delta):
+        cls.change_counter(author_id, 'followers_count', delta)
+
+    @classmethod
+    def followers_count_of(cls, author_id):
+        return cls.objects.filter(author_id=author_id).values_list(
+            'followers_count', flat=True
+        ).first() or 0
+
+    @classmethod
+    def posts_count_of(cls, author):
+        """Число постов автора, загруженного с select_related('post_stats')."""
+        try:
+            return author.post_stats.posts_count
+        except cls.DoesNotExist:
+            return 0
+
+    @classmethod
+    def recount_posts(cls, author_ids):
+        """Пересчитать число постов авторов author_ids одним UPDATE."""
+        posts = (
+            Post.objects.filter(author=OuterRef('author'))
+            .order_by()
+            .values('author')
+            .annotate(count=Count('pk'))
+            .values('count')
+        )
+        cls.objects.filter(author_id__in=author_ids).update(
+            posts_count=Coalesce(
+                Subquery(posts, output_field=IntegerField()), 0
+            )
+        )
+
+    @classmethod
+    def rebuild(cls):
+        """Пересчитать счётчики всех авторов по постам и подпискам."""
+        stats = {}
+        for model, field in ((Post, 'posts_count'),
+                             (Follow, 'followers_count')):
+            counts = (
+                model.objects.order_by()
+                .values('author')
+                .annotate(count=Count('pk'))
+                .values_list('author', 'count')
+            )
+            for author_id, count in counts.iterator():
+                author_stats = stats.setdefault(
+                    author_id, cls(author_id=author_id)
+                )
+                setattr(author_stats, field, count)
+        stats = list(stats.values())
+        cls.objects.all().delete()
+        cls.objects.bulk_create(stats, batch_size=1000)
+        return len(stats)
+
+
+class GroupStats(models.Model):
+    """Число постов группы и время последней публикации в ней.
+
+    Поддерживаются сигналами из ``posts.signals``, пересобираются
+    через ``rebuild()``.
+    """
+    group = models.OneToOneField(
+        Group,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Группа'
+    )
+    posts_count = models.PositiveIntegerField(
+        'Число постов',
+        default=0
+    )
+    last_activity = models.DateTimeField(
+        'Последняя публикация',
+        blank=True,
+        null=True
+    )
+
+    class Meta:
+        verbose_name = 'Статистика группы'
+        verbose_name_plural = 'Статистика групп'
+
+    def __str__(self):
+        return f'{self.group_id}: {self.posts_count}'
+
+    @staticmethod
+    def last_pub_date(group_id):
+        return Post.objects.filter(group_id=group_id).order_by(
+            '-pub_date'
+        ).values('pub_date')[:1]
+
+    @classmethod
+    def change_posts_count(cls, group_id, delta):
+        """Сдвинуть счётчик на delta одним UPDATE.
+
+        Время последней публикации берётся тем же UPDATE из индекса
+        (group, -pub_date): после удаления поста оно может уменьшиться.
+        """
+        stats = cls.objects.filter(group_id=group_id)
+        if delta < 0:
+            stats = stats.filter(posts_count__gte=-delta)
+        changes = {
+            'posts_count': F('posts_count') + delta,
+            'last_activity': Subquery(cls.last_pub_date(group_id)),
+        }
+        if stats.update(**changes) or delta < 0:
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(
+                    group_id=group_id,
+                    posts_count=delta,
+                    last_activity=cls.last_pub_date(group_id)[0]['pub_date'],
+                )
+        except IntegrityError:
+            # Строку только что создал параллельный запрос.
+            stats.update(**changes)
+
+    @classmethod
+    def recount(cls, group_ids):
+        """Пересчитать статистику групп group_ids одним UPDATE."""
+        group_ids = set(group_ids) - {None}
+        existing = cls.objects.filter(group_id__in=group_ids).values_list(
+            'group_id', flat=True
+        )
+        cls.objects.bulk_create(
+            [cls(group_id=pk) for pk in group_ids - set(existing)]
+        )
+        posts = Post.objects.filter(group=OuterRef('group')).order_by()
+        cls.objects.filter(group_id__in=group_ids).update(
+            posts_count=Coalesce(Subquery(
+                posts.values('group').annotate(count=Count('pk'))
+                .values('count'),
+                output_field=IntegerField(),
+            ), 0),
+            last_activity=Subquery(
+                posts.order_by('-pub_date').values('pub_date')[:1]
+            ),
+        )
+
+    @classmethod
+    def rebuild(cls):
+        """Пересчитать статистику всех групп по постам."""
+        stats = [
+            cls(group_id=group_id, posts_count=count, last_activity=last)
+            for group_id, count, last in (
+                Post.objects.filter(group__isnull=False)
+                .order_by()
+                .values('group')
+                .annotate(count=Count('pk'), last=Max('pub_date'))
+                .values_list('group', 'count', 'last')
+                .iterator()
+            )
+        ]
+        cls.objects.all().delete()
+        cls.objects.bulk_create(stats, batch_size=1000)
+        return len(stats)
+
+
+class GroupRanking(models.Model):
+    """Место группы по активности за окно времени.
+
+    Заполняется командой ``compute_group_rankings``, страница групп
+    только читает готовые места.
+    """
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        related_name='rankings',
+        verbose_name='Группа'
+    )
+    window = models.CharField(
+        'Окно',
+        max_length=16
+    )
+    posts_count = models.PositiveIntegerField(
+        'Постов за окно',
+        default=0
+    )
+    comments_count = models.PositiveIntegerField(
+        'Комментариев за окно',
+        default=0
+    )
+    score = models.FloatField(
+        'Активность',
+        default=0
+    )
+    rank = models.PositiveIntegerField('Место')
+    computed_at = models.DateTimeField('Посчитано')
+
+    class Meta:
+        verbose_name = 'Место группы'
+        verbose_name_plural = 'Места групп'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['group', 'window'], name='unique_group_ranking'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['window', 'rank'],
+                name='group_ranking_window_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.window}: {self.group_id} #{self.rank}'
+
+
+class Follow(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='follower',
+        verbose_name='Подписчик'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='following',
+        verbose_name='Автор'
+    )
+    synced_at = models.DateTimeField(
+        'Лента сверена',
+        default=timezone.now,
+        help_text='Посты автора до этого момента уже в ленте подписчика'
+    )
+
+    class Meta:
+        verbose_name = 'Подписка'
+        verbose_name_plural = 'Подписки'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_follow'
+            ),
+            models.CheckConstraint(
+                check=~Q(user=F('author')), name='no_self_follow'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} -> {self.author_id}'
+
+
+class TimelineEntry(models.Model):
+    """Пост в личной ленте подписчика.
+
+    Заполняется при публикации (``posts.timeline``), поэтому лента
+    читается одним проходом по индексу (user, -pub_date, -post_id).
+    """
+    # Индекс по user покрывают составные индексы ниже.
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        db_index=False
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_timeline_entry'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_pub_date_idx',
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='timeline_user_author_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.post_id}'
+
+
+class ListingVersion(models.Model):
+    """Время последнего изменения ленты: главной, группы или профиля.
+
+    Общее для всех процессов, в отличие от их кешей: по нему строятся
+    ETag страниц лент и ключи их кеша (``posts.cache.listing_version``).
+    """
+    name = models.CharField(
+        'Лента',
+        max_length=200,
+        primary_key=True
+    )
+    changed = models.DateTimeField('Изменена')
+
+    class Meta:
+        verbose_name = 'Версия ленты'
+        verbose_name_plural = 'Версии лент'
+
+    def __str__(self):
+        return f'{self.name}: {self.changed}'
@@ -0,0 +1,200 @@
+"""Массовая модерация постов пачками set-based запросов.
+
+Действия не загружают модели и не вызывают сигналы на каждый пост:
+посты, комментарии и записи лент меняются UPDATE/DELETE пачками
+по ``settings.MODERATION_BATCH_SIZE`` id, каждая пачка — своя
+транзакция. То, что обычно поддерживают сигналы, собирается
+в ``Changes`` и синхронизируется одним проходом в ``Changes.apply()``:
+счётчики авторов и групп, шапки групп, карточки и страницы лент.
+Поисковый индекс меняется в транзакции пачки вместе с постами.
+"""
+import json
+import logging
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from core.sqlite import write_lock
+
+from .cache import invalidate_post_cards, refresh_group_headers
+from .models import AuthorStats, Comment, GroupStats, Post, TimelineEntry
+from .search import get_backend as get_search_backend
+from .signals import releasable, touch_post_listings
+
+logger = logging.getLogger(__name__)
+
+
+def id_batches(queryset, batch_size=None):
+    """Id строк queryset пачками по возрастанию, без OFFSET.
+
+    Каждая пачка читается заново после предыдущей, поэтому строки
+    можно удалять или менять между пачками.
+    """
+    batch_size = batch_size or settings.MODERATION_BATCH_SIZE
+    ids = queryset.order_by('pk').values_list('pk', flat=True)
+    last = None
+    while True:
+        batch = ids if last is None else ids.filter(pk__gt=last)
+        batch = list(batch[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last = batch[-1]
+
+
+def raw_delete(queryset):
+    """DELETE одним запросом, без загрузки строк, сигналов и каскадов."""
+    return queryset._raw_delete(queryset.db)
+
+
+class Changes:
+    """Что изменили пачки и что нужно синхронизировать в конце."""
+
+    def __init__(self, recount=False):
+        # recount: посты ушли из авторов или групп, счётчики устарели.
+        self.recount = recount
+        self.post_ids = set()
+        self.author_ids = set()
+        self.group_ids = set()
+        self.counts = {
+            'batches': 0, 'posts': 0, 'comments': 0, 'files': 0,
+        }
+
+    def add_posts(self, rows):
+        """Запомнить посты из строк (pk, author_id, group_id)."""
+        for pk, author_id, group_id in rows:
+            self.post_ids.add(pk)
+            self.author_ids.add(author_id)
+            self.group_ids.add(group_id)
+
+    def batch_done(self, action, **counts):
+        self.counts['batches'] += 1
+        for name, count in counts.items():
+            self.counts[name] += count
+        logger.info('%s: %s', action, ', '.join(
+            f'{name} {count}' for name, count in self.counts.items()
+        ))
+
+    def apply(self):
+        """Синхронизировать счётчики и кеши одним проходом."""
+        self.group_ids.discard(None)
+        if self.recount:
+            AuthorStats.recount_posts(self.author_ids)
+            GroupStats.recount(self.group_ids)
+            refresh_group_headers(self.group_ids)
+        invalidate_post_cards(self.post_ids)
+        touch_post_listings(self.author_ids, self.group_ids)
+        return self.counts
+
+
+def post_rows(post_ids, *fields):
+    return list(Post.objects.filter(pk__in=post_ids).values_list(
+        'pk', 'author_id', 'group_id', *fields
+    ))
+
+
+def reassign_group(queryset, group):
+    """Перенести посты queryset в группу group (None — без группы)."""
+    changes = Changes(recount=True)
+    group_id = group.pk if group is not None else None
+    changes.group_ids.add(group_id)
+    for post_ids in id_batches(queryset):
+        with write_lock():
+            rows = post_rows(post_ids)
+            Post.objects.filter(pk__in=post_ids).update(
+                group_id=group_id, updated=timezone.now()
+            )
+        changes.add_posts(rows)
+        changes.batch_done('reassign_group', posts=len(rows))
+    return changes.apply()
+
+
+def delete_files(rows):
+    """Отпустить картинки удалённых постов и их варианты; вернуть число.
+
+    Имя отпускается по разу на пост: одну картинку могут делить
+    несколько постов, и хранилище удалит файл, когда ссылок
+    не останется. Файлы без счётчика ссылок — см. ``releasable``.
+    """
+    names = []
+    for *_, image, image_variants in rows:
+        if image:
+            names.append(image)
+        try:
+            names.extend(
+                variant['name'] for variant in json.loads(image_variants)
+            )
+        except ValueError:
+            pass
+    names = releasable(names)
+    for name in names:
+        default_storage.delete(name)
+    return len(names)
+
+
+def delete_posts(queryset):
+    """Удалить посты queryset с комментариями, лентами и файлами."""
+    changes = Changes(recount=True)
+    search = get_search_backend()
+    for post_ids in id_batches(queryset):
+        with write_lock():
+            rows = post_rows(post_ids, 'image', 'image_variants')
+            # Каскады Comment и TimelineEntry — явно, до самих постов.
+            comments = raw_delete(
+                Comment.objects.filter(post_id__in=post_ids)
+            )
+            raw_delete(TimelineEntry.objects.filter(post_id__in=post_ids))
+            raw_delete(Post.objects.filter(pk__in=post_ids))
+            search.remove(post_ids)
+        # Файлы отпускаются после коммита: откат не оставит постов
+        # без картинок.
+        files = delete_files(rows)
+        changes.add_posts(row[:3] for row in rows)
+        changes.batch_done(
+            'delete_posts', posts=len(rows), comments=comments, files=files
+        )
+    return changes.apply()
+
+
+def authors_posts(queryset):
+    """Все посты авторов постов queryset."""
+    # Список авторов читается сразу: подзапрос к тем же постам
+    # пустел бы по мере удаления пачек.
+    author_ids = set(
+        queryset.order_by().values_list('author_id', flat=True).distinct()
+    )
+    return Post.objects.filter(author_id__in=author_ids)
+
+
+def delete_authors_posts(queryset):
+    """Удалить все посты авторов постов queryset."""
+    return delete_posts(authors_posts(queryset))
+
+
+def preview(queryset):
+    """Сколько постов queryset и комментариев к ним затронет действие."""
+    posts = queryset.order_by()
+    return {
+        'posts': posts.count(),
+        'comments': Comment.objects.filter(
+            post_id__in=posts.values('pk')
+        ).count(),
+    }
+
+
+def purge_comments(queryset):
+    """Удалить все комментарии к постам queryset."""
+    changes = Changes()
+    for post_ids in id_batches(queryset):
+        rows = post_rows(post_ids)
+        comments = Comment.objects.filter(post_id__in=post_ids)
+        deleted = 0
+        for comment_ids in id_batches(comments):
+            with write_lock():
+                deleted += raw_delete(
+                    Comment.objects.filter(pk__in=comment_ids)
+                )
+        changes.add_posts(rows)
+        changes.batch_done('purge_comments', comments=deleted)
+    return changes.apply()
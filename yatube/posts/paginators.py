@@ -0,0 +1,199 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class CursorPage(Page):
+    """Страница, полученная поиском по ключу, без номера и общего счётчика."""
+
+    def __init__(self, object_list, paginator,
+                 next_cursor=None, previous_cursor=None):
+        super().__init__(object_list, None, paginator)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<CursorPage of %s objects>' % len(self)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class CursorPaginator(Paginator):
+    """Паджинатор по ключу сортировки (keyset) вместо LIMIT/OFFSET.
+
+    Страница ищется от непрозрачного курсора, в котором закодированы
+    значения ключа последней показанной записи, поэтому глубокие страницы
+    стоят столько же, сколько первая, а COUNT(*) выполняется только
+    при обращении к ``count``/``num_pages``. Метод ``get_page`` оставлен
+    от ``Paginator`` для совместимости со старыми ссылками ``?page=N``.
+    """
+
+    def __init__(self, object_list, per_page, keys=('-pub_date', '-id'),
+                 **kwargs):
+        self.keys = [
+            (key.lstrip('-'), key.startswith('-')) for key in keys
+        ]
+        super().__init__(object_list.order_by(*keys), per_page, **kwargs)
+
+    def encode_cursor(self, obj, direction):
+        opts = self.object_list.model._meta
+        values = [
+            opts.get_field(name).value_to_string(obj)
+            for name, _ in self.keys
+        ]
+        raw = json.dumps([direction, values]).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Вернуть направление и значения ключа, или None для мусора."""
+        opts = self.object_list.model._meta
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, values = json.loads(raw.decode())
+            if direction not in (NEXT, PREVIOUS):
+                return None
+            if len(values) != len(self.keys):
+                return None
+            return direction, [
+                opts.get_field(name).to_python(value)
+                for (name, _), value in zip(self.keys, values)
+            ]
+        except (binascii.Error, UnicodeDecodeError, TypeError, ValueError,
+                ValidationError):
+            return None
+
+    def _seek(self, values, backwards):
+        """Условие «строго после курсора» в порядке обхода.
+
+        Первый ключ дополнительно ограничен нестрогим неравенством,
+        чтобы база начинала поиск по индексу, а не фильтровала
+        его с начала.
+        """
+        seek = Q()
+        for index, (name, descending) in enumerate(self.keys):
+            lookup = 'lt' if descending != backwards else 'gt'
+            condition = Q(**{'%s__%s' % (name, lookup): values[index]})
+            for (prev_name, _), value in zip(self.keys, values[:index]):
+                condition &= Q(**{prev_name: value})
+            seek |= condition
+        name, descending = self.keys[0]
+        lookup = 'lte' if descending != backwards else 'gte'
+        return Q(**{'%s__%s' % (name, lookup): values[0]}) & seek
+
+    def cursor_page(self, cursor=None, restart=True):
+        """Вернуть страницу, следующую за курсором (или первую).
+
+        Если записей за курсором не осталось, ``restart`` возвращает
+        первую страницу, иначе — пустую: подгрузка продолжения
+        не должна повторять уже показанное.
+        """
+        decoded = self.decode_cursor(cursor) if cursor else None
+        if decoded is None:
+            direction, values = NEXT, None
+        else:
+            direction, values = decoded
+        backwards = direction == PREVIOUS
+        queryset = self.object_list
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, backwards))
+        if backwards:
+            queryset = queryset.reverse()
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if values is not None and not rows:
+            # Записи за курсором исчезли: начинаем с первой страницы.
+            if not restart:
+                return CursorPage([], self)
+            return self.cursor_page()
+        if backwards:
+            rows.reverse()
+            has_previous, has_next = has_more, True
+        else:
+            has_previous, has_next = values is not None, has_more
+        return CursorPage(
+            rows,
+            self,
+            next_cursor=(
+                self.encode_cursor(rows[-1], NEXT) if has_next else None
+            ),
+            previous_cursor=(
+                self.encode_cursor(rows[0], PREVIOUS)
+                if has_previous else None
+            ),
+        )
+
+
+def estimated_count(model, using='default'):
+    """Примерное число строк таблицы без COUNT(*), None — если не знаем.
+
+    PostgreSQL и MySQL хранят оценку в статистике таблицы. В SQLite
+    берётся последний выданный AUTOINCREMENT-id: удалённые строки
+    в нём не вычтены, поэтому оценка бывает завышена.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    queries = {
+        'postgresql': 'SELECT reltuples FROM pg_class WHERE relname = %s',
+        'mysql': (
+            'SELECT table_rows FROM information_schema.tables '
+            'WHERE table_schema = DATABASE() AND table_name = %s'
+        ),
+        'sqlite': 'SELECT seq FROM sqlite_sequence WHERE name = %s',
+    }
+    if connection.vendor not in queries:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(queries[connection.vendor], [table])
+        row = cursor.fetchone()
+    # reltuples = -1: таблицу ещё не анализировали.
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Паджинатор списков админки без точного COUNT(*) по всей таблице.
+
+    Для списка без фильтров число строк берётся из ``estimated_count``,
+    если таблица больше ``exact_limit`` строк. Оценка бывает завышена:
+    если страница по ней оказалась пустой, строки пересчитываются
+    точно и отдаётся последняя настоящая страница. Отфильтрованные
+    списки, в том числе результаты поиска, и небольшие таблицы
+    считаются точно, обычным COUNT(*).
+    """
+    exact_limit = 10000
+    estimated = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > self.exact_limit:
+                self.estimated = True
+                return estimate
+        return super().count
+
+    def page(self, number):
+        page = super().page(number)
+        # Строки страницы всё равно читаются: проверка их не повторит.
+        if self.estimated and not page.object_list:
+            self.estimated = False
+            self.__dict__['count'] = self.object_list.count()
+            self.__dict__.pop('num_pages', None)
+            page = super().page(min(page.number, self.num_pages))
+        return page
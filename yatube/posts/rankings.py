@@ -0,0 +1,113 @@
+"""Места групп по активности за окна времени.
+
+Места пересчитываются периодически (``manage.py compute_group_rankings``)
+в таблицу ``GroupRanking``: каталог групп читает готовые места и не
+группирует все посты на каждый запрос. Окна задаются в
+``settings.GROUP_RANKING_WINDOWS``, сортировка ``posts`` — по числу
+постов за всё время из ``GroupStats``.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, F, FilteredRelation, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core.sqlite import write_lock
+
+from .models import Comment, Group, GroupRanking, Post
+
+# Комментарий — меньший вклад в активность группы, чем пост.
+COMMENT_WEIGHT = 0.5
+ALL_TIME_SORT = 'posts'
+SORT_TITLES = {
+    'day': 'За день',
+    'week': 'За неделю',
+    'month': 'За месяц',
+    ALL_TIME_SORT: 'За всё время',
+}
+
+
+def sorts():
+    """Сортировки каталога: имя -> подпись."""
+    return {
+        sort: SORT_TITLES.get(sort, sort)
+        for sort in (*settings.GROUP_RANKING_WINDOWS, ALL_TIME_SORT)
+    }
+
+
+def window_counts(queryset, group_field):
+    return dict(
+        queryset.filter(**{f'{group_field}__isnull': False})
+        .order_by()
+        .values(group_field)
+        .annotate(count=Count('pk'))
+        .values_list(group_field, 'count')
+    )
+
+
+def rank_window(window, days, group_ids, now):
+    """Места всех групп за последние ``days`` дней."""
+    since = now - timedelta(days=days)
+    posts = window_counts(Post.objects.filter(pub_date__gte=since), 'group')
+    comments = window_counts(
+        Comment.objects.filter(created__gte=since), 'post__group'
+    )
+    rankings = [
+        GroupRanking(
+            group_id=group_id,
+            window=window,
+            posts_count=posts.get(group_id, 0),
+            comments_count=comments.get(group_id, 0),
+            score=(posts.get(group_id, 0)
+                   + COMMENT_WEIGHT * comments.get(group_id, 0)),
+            computed_at=now,
+        )
+        for group_id in group_ids
+    ]
+    rankings.sort(key=lambda ranking: (
+        -ranking.score, -ranking.posts_count, ranking.group_id
+    ))
+    for rank, ranking in enumerate(rankings, 1):
+        ranking.rank = rank
+    return rankings
+
+
+def compute_rankings(windows=None, now=None):
+    """Пересчитать места групп; вернуть число групп.
+
+    Окно заменяется целиком в одной транзакции: каталог видит либо
+    старые места, либо новые.
+    """
+    windows = windows or settings.GROUP_RANKING_WINDOWS
+    now = now or timezone.now()
+    group_ids = list(Group.objects.values_list('pk', flat=True))
+    for window in windows:
+        rankings = rank_window(
+            window, settings.GROUP_RANKING_WINDOWS[window], group_ids, now
+        )
+        with write_lock():
+            GroupRanking.objects.filter(window=window).delete()
+            GroupRanking.objects.bulk_create(rankings, batch_size=1000)
+    return len(group_ids)
+
+
+def ranked_groups(sort):
+    """Группы со статистикой в порядке ``sort`` одним запросом.
+
+    Группы, созданные после пересчёта, идут в конце окна.
+    """
+    groups = Group.objects.annotate(
+        posts_count=Coalesce('stats__posts_count', 0),
+        last_activity=F('stats__last_activity'),
+    )
+    if sort == ALL_TIME_SORT:
+        return groups.order_by('-posts_count', 'title', 'pk')
+    return groups.annotate(
+        window_ranking=FilteredRelation(
+            'rankings', condition=Q(rankings__window=sort)
+        ),
+        rank=F('window_ranking__rank'),
+        window_posts=F('window_ranking__posts_count'),
+        window_comments=F('window_ranking__comments_count'),
+    ).order_by(F('rank').asc(nulls_last=True), 'title', 'pk')
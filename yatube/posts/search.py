@@ -0,0 +1,201 @@
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+
+WORD_RE = re.compile(r'\w+')
+
+
+class LikeSearchBackend:
+    """Запасной поиск через LIKE для баз без полнотекстового индекса."""
+
+    def index(self, posts):
+        pass
+
+    def remove(self, post_ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def filter_queryset(self, queryset, query):
+        return queryset.filter(text__icontains=query)
+
+    def count(self, query):
+        return self.filter_queryset(Post.objects.all(), query).count()
+
+    def search_ids(self, query, offset, limit):
+        return list(
+            self.filter_queryset(Post.objects.all(), query)
+            .values_list('pk', flat=True)[offset:offset + limit]
+        )
+
+
+class SQLiteSearchBackend(LikeSearchBackend):
+    """FTS5: отдельная таблица posts_post_fts, rowid совпадает с id поста."""
+
+    table = 'posts_post_fts'
+
+    @staticmethod
+    def match_query(query):
+        # Каждое слово в кавычках: операторы FTS5 из ввода не исполняются.
+        return ' '.join(
+            '"{}"'.format(word) for word in WORD_RE.findall(query)
+        )
+
+    def index(self, posts):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT OR REPLACE INTO {self.table} (rowid, text) '
+                'VALUES (%s, %s)',
+                [(post.pk, post.text) for post in posts],
+            )
+
+    def remove(self, post_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {self.table} WHERE rowid = %s',
+                [(post_id,) for post_id in post_ids],
+            )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, text) '
+                'SELECT id, text FROM posts_post'
+            )
+
+    def filter_queryset(self, queryset, query):
+        match = self.match_query(query)
+        if not match:
+            return queryset.none()
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s',
+            [match],
+        ))
+
+    def count(self, query):
+        match = self.match_query(query)
+        if not match:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM {self.table} '
+                f'WHERE {self.table} MATCH %s',
+                [match],
+            )
+            return cursor.fetchone()[0]
+
+    def search_ids(self, query, offset, limit):
+        match = self.match_query(query)
+        if not match:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {self.table} '
+                f'WHERE {self.table} MATCH %s '
+                'ORDER BY rank LIMIT %s OFFSET %s',
+                [match, limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PostgresSearchBackend(LikeSearchBackend):
+    """tsvector в таблице posts_post_search с GIN-индексом."""
+
+    table = 'posts_post_search'
+    config = 'russian'
+
+    def index(self, posts):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {self.table} (post_id, document) '
+                'VALUES (%s, to_tsvector(%s::regconfig, %s)) '
+                'ON CONFLICT (post_id) '
+                'DO UPDATE SET document = EXCLUDED.document',
+                [(post.pk, self.config, post.text) for post in posts],
+            )
+
+    def remove(self, post_ids):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {self.table} WHERE post_id = ANY(%s)',
+                [list(post_ids)],
+            )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'TRUNCATE {self.table}')
+            cursor.execute(
+                f'INSERT INTO {self.table} (post_id, document) '
+                'SELECT id, to_tsvector(%s::regconfig, text) FROM posts_post',
+                [self.config],
+            )
+
+    def filter_queryset(self, queryset, query):
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT post_id FROM {self.table} '
+            'WHERE document @@ plainto_tsquery(%s::regconfig, %s)',
+            [self.config, query],
+        ))
+
+    def count(self, query):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM {self.table} '
+                'WHERE document @@ plainto_tsquery(%s::regconfig, %s)',
+                [self.config, query],
+            )
+            return cursor.fetchone()[0]
+
+    def search_ids(self, query, offset, limit):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT post_id FROM {self.table}, '
+                'plainto_tsquery(%s::regconfig, %s) AS query '
+                'WHERE document @@ query '
+                'ORDER BY ts_rank(document, query) DESC, post_id DESC '
+                'LIMIT %s OFFSET %s',
+                [self.config, query, limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_backend():
+    return BACKENDS.get(connection.vendor, LikeSearchBackend)()
+
+
+class SearchResults:
+    """Ленивая выдача поиска для Paginator.
+
+    Paginator берёт только count() и срез страницы, поэтому из индекса
+    читаются id одной страницы в порядке релевантности, а посты
+    догружаются одним запросом.
+    """
+
+    def __init__(self, query, backend=None):
+        self.query = query
+        self.backend = backend or get_backend()
+
+    def count(self):
+        return self.backend.count(self.query)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        ids = self.backend.search_ids(self.query, start, index.stop - start)
+        posts = Post.objects.for_feed().in_bulk(ids)
+        return [posts[post_id] for post_id in ids if post_id in posts]
@@ -0,0 +1,283 @@
+import json
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from core.models import StoredFile
+
+from .cache import (GROUP_LISTING, INDEX_LISTING, PROFILE_LISTING,
+                    forget_group_header, invalidate_post_cards,
+                    refresh_group_headers, touch_listings)
+from . import timeline
+from .models import (AuthorStats, Comment, Follow, Group, GroupStats, Post,
+                     User)
+from .search import get_backend as get_search_backend
+
+# Поля автора и группы, которые видны в карточке поста.
+CARD_AUTHOR_FIELDS = {'first_name', 'last_name'}
+CARD_GROUP_FIELDS = {'title'}
+
+
+def shown_in_card(update_fields, card_fields):
+    return update_fields is None or bool(card_fields & set(update_fields))
+
+
+def touch_post_listings(author_ids=(), group_ids=()):
+    """Сбросить закешированные страницы лент, где видны посты."""
+    author_ids = {pk for pk in author_ids if pk is not None}
+    group_ids = {pk for pk in group_ids if pk is not None}
+    listings = [INDEX_LISTING]
+    if author_ids:
+        listings += [
+            PROFILE_LISTING.format(username)
+            for username in User.objects.filter(
+                pk__in=author_ids
+            ).values_list('username', flat=True)
+        ]
+    if group_ids:
+        listings += [
+            GROUP_LISTING.format(slug)
+            for slug in Group.objects.filter(
+                pk__in=group_ids
+            ).values_list('slug', flat=True)
+        ]
+    touch_listings(listings)
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, raw, **kwargs):
+    """Пост создан или перешёл к другому автору."""
+    if raw:
+        return
+    loaded_author_id = getattr(instance, '_loaded_author_id', None)
+    if created:
+        AuthorStats.change_posts_count(instance.author_id, 1)
+    elif (loaded_author_id is not None
+          and loaded_author_id != instance.author_id):
+        AuthorStats.change_posts_count(loaded_author_id, -1)
+        AuthorStats.change_posts_count(instance.author_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    AuthorStats.change_posts_count(instance.author_id, -1)
+
+
+def change_group_posts(changes):
+    """Сдвинуть счётчики групп {group_id: delta} и обновить их шапки."""
+    changes = {pk: delta for pk, delta in changes.items() if pk is not None}
+    for group_id, delta in changes.items():
+        GroupStats.change_posts_count(group_id, delta)
+    if changes:
+        refresh_group_headers(changes)
+
+
+@receiver(post_save, sender=Post)
+def count_group_post(sender, instance, created, raw, **kwargs):
+    """Пост создан или перешёл в другую группу."""
+    if raw:
+        return
+    loaded_group_id = getattr(instance, '_loaded_group_id', instance.group_id)
+    if created:
+        change_group_posts({instance.group_id: 1})
+    elif loaded_group_id != instance.group_id:
+        change_group_posts({loaded_group_id: -1, instance.group_id: 1})
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_group_post(sender, instance, **kwargs):
+    change_group_posts({instance.group_id: -1})
+
+
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance, **kwargs):
+    get_search_backend().index([instance])
+
+
+@receiver(post_delete, sender=Post)
+def unindex_deleted_post(sender, instance, **kwargs):
+    get_search_backend().remove([instance.pk])
+
+
+@receiver(post_save, sender=Post)
+def fan_out_saved_post(sender, instance, created, raw, **kwargs):
+    # Записи лент удаляются вместе с постом по CASCADE.
+    if raw:
+        return
+    loaded_author_id = getattr(instance, '_loaded_author_id', None)
+    if created:
+        timeline.fan_out(instance)
+    elif (loaded_author_id is not None
+          and loaded_author_id != instance.author_id):
+        timeline.reassign(instance)
+
+
+def releasable(names):
+    """Имена файлов удалённых ссылок, которые можно отпустить.
+
+    Файлы со строкой ``StoredFile`` отпускаются по разу на ссылку.
+    Файл без строки сохранён до подсчёта ссылок, и хранилище удалит
+    его сразу: такой отпускается один раз и только если на него больше
+    не ссылается ни один пост.
+    """
+    names = [name for name in names if name]
+    tracked = set(StoredFile.objects.filter(
+        name__in=set(names)
+    ).values_list('name', flat=True))
+    return [name for name in names if name in tracked] + [
+        name for name in set(names) - tracked
+        if not Post.objects.filter(
+            Q(image=name) | Q(image_variants__contains=json.dumps(name))
+        ).exists()
+    ]
+
+
+def release_files(names):
+    """Отпустить файлы после коммита: хранилище удалит их, когда
+    на них не останется ссылок."""
+    names = [name for name in names if name]
+    if not names:
+        return
+
+    def release():
+        for name in releasable(names):
+            default_storage.delete(name)
+    transaction.on_commit(release)
+
+
+@receiver(pre_save, sender=Post)
+def load_original_values(sender, instance, raw, **kwargs):
+    if not raw:
+        instance.load_original_values()
+
+
+@receiver(pre_save, sender=Post)
+def mark_uploaded_image(sender, instance, raw, **kwargs):
+    # Новый файл сохраняется в хранилище уже после этого сигнала.
+    instance._image_uploaded = (
+        not raw and bool(instance.image) and not instance.image._committed
+    )
+
+
+@receiver(post_save, sender=Post)
+def release_replaced_image(sender, instance, created, raw, **kwargs):
+    loaded_image = getattr(instance, '_loaded_image', None)
+    if raw or created or not loaded_image:
+        return
+    # Та же картинка, загруженная заново, — тоже новая ссылка на файл.
+    if instance._image_uploaded or loaded_image != instance.image.name:
+        # Варианты старой картинки удаляет generate_thumbnail.
+        release_files([loaded_image])
+
+
+@receiver(post_delete, sender=Post)
+def release_deleted_files(sender, instance, **kwargs):
+    release_files([instance.image.name] + [
+        variant['name'] for variant in instance.variants
+    ])
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_caches(sender, instance, **kwargs):
+    invalidate_post_cards([instance.pk])
+    touch_post_listings(
+        author_ids=(
+            instance.author_id, getattr(instance, '_loaded_author_id', None)
+        ),
+        group_ids=(
+            instance.group_id, getattr(instance, '_loaded_group_id', None)
+        ),
+    )
+    # Обработчик сохранения поста, подключённый последним: дальнейшие
+    # save() сравниваются уже с текущими автором и группой.
+    instance._loaded_author_id = instance.author_id
+    instance._loaded_group_id = instance.group_id
+    instance._loaded_image = instance.image.name
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_commented_post(sender, instance, **kwargs):
+    # Число комментариев видно в карточке поста в лентах. Страница
+    # поста сама сверяет число и время комментариев, Post.updated
+    # остаётся временем правки поста.
+    post = Post.objects.filter(pk=instance.post_id).values(
+        'author__username', 'group__slug'
+    ).first()
+    if post is None:
+        return
+    listings = [INDEX_LISTING,
+                PROFILE_LISTING.format(post['author__username'])]
+    if post['group__slug']:
+        listings.append(GROUP_LISTING.format(post['group__slug']))
+    touch_listings(listings)
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_cards(sender, instance, created, update_fields,
+                            **kwargs):
+    if created or not shown_in_card(update_fields, CARD_AUTHOR_FIELDS):
+        return
+    invalidate_post_cards(
+        instance.posts.values_list('pk', flat=True).iterator()
+    )
+    touch_post_listings(
+        [instance.pk],
+        instance.posts.order_by().values_list('group', flat=True).distinct()
+    )
+
+
+@receiver(post_save, sender=Group)
+def invalidate_group_cards(sender, instance, created, update_fields,
+                           **kwargs):
+    if created or not shown_in_card(update_fields, CARD_GROUP_FIELDS):
+        return
+    invalidate_post_cards(
+        instance.posts.values_list('pk', flat=True).iterator()
+    )
+    touch_listings([INDEX_LISTING, GROUP_LISTING.format(instance.slug)])
+
+
+@receiver(post_save, sender=Group)
+def refresh_saved_group_header(sender, instance, raw, **kwargs):
+    if raw:
+        return
+    loaded_slug = getattr(instance, '_loaded_slug', instance.slug)
+    # Новая версия ленты сбрасывает шапку и в кешах других процессов.
+    listings = [GROUP_LISTING.format(instance.slug)]
+    if loaded_slug != instance.slug:
+        # По старому адресу группы больше нет.
+        forget_group_header(loaded_slug)
+        listings.append(GROUP_LISTING.format(loaded_slug))
+    touch_listings(listings)
+    refresh_group_headers([instance.pk])
+    instance._loaded_slug = instance.slug
+
+
+@receiver(pre_delete, sender=Group)
+def invalidate_deleted_group_cards(sender, instance, **kwargs):
+    # Посты останутся без группы через SET_NULL, минуя post_save.
+    invalidate_post_cards(
+        list(instance.posts.values_list('pk', flat=True))
+    )
+    touch_listings([INDEX_LISTING, GROUP_LISTING.format(instance.slug)])
+    forget_group_header(instance.slug)
+
+
+@receiver(post_save, sender=Follow)
+def count_saved_follow(sender, instance, created, raw, **kwargs):
+    if raw or not created:
+        return
+    AuthorStats.change_followers_count(instance.author_id, 1)
+    timeline.backfill(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    AuthorStats.change_followers_count(instance.author_id, -1)
+    timeline.remove(instance)
@@ -0,0 +1,88 @@
+from datetime import datetime
+from unittest import mock
+
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ..admin import IndexedDatesQuerySet
+from ..models import Group, Post, User
+from ..paginators import EstimatedCountPaginator
+
+
+class PostAdminTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description=''
+        )
+        cls.url = reverse('admin:posts_post_changelist')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def add_posts(self, count):
+        start = Post.objects.count()
+        for number in range(start, start + count):
+            author = User.objects.create_user(username=f'author{number}')
+            Post.objects.create(
+                text=f'Пост {number}', author=author, group=self.group
+            )
+
+    def changelist_queries(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in queries.captured_queries]
+
+    def test_queries_do_not_grow_with_rows(self):
+        self.add_posts(2)
+        few = len(self.changelist_queries())
+        self.add_posts(30)
+        self.assertEqual(len(self.changelist_queries()), few)
+
+    def test_large_table_is_not_counted(self):
+        self.add_posts(3)
+        with mock.patch.object(EstimatedCountPaginator, 'exact_limit', 0):
+            queries = self.changelist_queries()
+        self.assertFalse([
+            sql for sql in queries
+            if 'COUNT(*)' in sql and '"posts_post"' in sql
+        ])
+
+    def test_overestimated_count_falls_back_to_exact(self):
+        """Страница за концом завышенной оценки — последняя настоящая."""
+        self.add_posts(3)
+        paginator = EstimatedCountPaginator(Post.objects.order_by('pk'), 2)
+        with mock.patch(
+            'posts.paginators.estimated_count', return_value=100
+        ), mock.patch.object(EstimatedCountPaginator, 'exact_limit', 0):
+            self.assertEqual(paginator.num_pages, 50)
+            page = paginator.page(10)
+        self.assertEqual(page.number, 2)
+        self.assertEqual(len(page), 1)
+        self.assertEqual(paginator.count, 3)
+        self.assertEqual(paginator.num_pages, 2)
+
+    def test_date_hierarchy_periods(self):
+        self.add_posts(2)
+        old = Post.objects.first()
+        Post.objects.filter(pk=old.pk).update(pub_date=timezone.make_aware(
+            datetime(2020, 3, 15, 12)
+        ))
+        posts = IndexedDatesQuerySet(Post)
+        for kind in ('year', 'month', 'day'):
+            with self.subTest(kind=kind):
+                self.assertEqual(
+                    posts.dates('pub_date', kind, 'DESC'),
+                    list(Post.objects.dates('pub_date', kind, 'DESC')),
+                )
+        response = self.client.get(self.url, {'pub_date__year': 2020})
+        self.assertContains(response, 'Пост')
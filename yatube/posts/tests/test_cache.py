@@ -0,0 +1,403 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ..cache import (GROUP_HEADER_KEY, GROUP_LISTING, POST_CARD_TEMPLATE,
+                     group_header, group_header_cache, page_cache,
+                     post_card_cache, touch_listings)
+from ..models import (Comment, Follow, Group, GroupStats, ListingVersion,
+                      Post, User)
+from ..views import SELECT_LIMIT
+
+
+def data_queries(queries):
+    """Запросы, кроме чтения версий лент."""
+    return [
+        query['sql'] for query in queries.captured_queries
+        if '"posts_listingversion"' not in query['sql']
+    ]
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='post_author',
+            first_name='Лев',
+            last_name='Толстой',
+        )
+        cls.group = Group.objects.create(
+            title='Название группы',
+            slug='slug',
+            description='Описание группы',
+        )
+        cls.post = Post.objects.create(
+            text='Текст',
+            author=cls.user,
+            group=cls.group,
+        )
+
+    def setUp(self):
+        post_card_cache().clear()
+        # Авторизованному посетителю страница целиком из кеша не отдаётся,
+        # поэтому видна работа кеша карточек.
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.index = reverse('posts:index')
+
+    def test_warm_cache_skips_card_rendering(self):
+        """На прогретом кеше карточки не рендерятся заново."""
+        response = self.authorized_client.get(self.index)
+        self.assertTemplateUsed(response, POST_CARD_TEMPLATE)
+        response = self.authorized_client.get(self.index)
+        self.assertTemplateNotUsed(response, POST_CARD_TEMPLATE)
+        self.assertContains(response, self.post.text)
+
+    def test_post_edit_invalidates_card(self):
+        """Правка поста сбрасывает его карточку."""
+        self.authorized_client.get(self.index)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Новый текст'
+        post.save()
+        response = self.authorized_client.get(self.index)
+        self.assertContains(response, 'Новый текст')
+
+    def test_new_comment_changes_card_version(self):
+        """Новый комментарий меняет версию карточки."""
+        self.authorized_client.get(self.index)
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий'
+        )
+        response = self.authorized_client.get(self.index)
+        self.assertContains(response, 'Комментариев: 1')
+
+    def test_author_and_group_changes_invalidate_cards(self):
+        """Смена имени автора и названия группы сбрасывает карточки."""
+        self.authorized_client.get(self.index)
+        user = User.objects.get(pk=self.user.pk)
+        user.first_name = 'Алексей'
+        user.save()
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Новое название'
+        group.save()
+        response = self.authorized_client.get(self.index)
+        self.assertContains(response, 'Алексей Толстой')
+        self.assertContains(response, 'Группа: Новое название')
+
+    def test_rename_in_other_process_changes_cards(self):
+        """Карточка из кеша не переживает переименование без сигналов."""
+        self.authorized_client.get(self.index)
+        User.objects.filter(pk=self.user.pk).update(first_name='Алексей')
+        Group.objects.filter(pk=self.group.pk).update(title='Новое название')
+        response = self.authorized_client.get(self.index)
+        self.assertContains(response, 'Алексей Толстой')
+        self.assertContains(response, 'Группа: Новое название')
+
+    def test_last_login_keeps_cards(self):
+        """Обновление last_login при входе не трогает кеш карточек."""
+        self.authorized_client.get(self.index)
+        Client().force_login(self.user)
+        response = self.authorized_client.get(self.index)
+        self.assertTemplateNotUsed(response, POST_CARD_TEMPLATE)
+
+
+class PageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='post_author')
+        cls.group = Group.objects.create(
+            title='Название группы',
+            slug='slug',
+            description='Описание группы',
+        )
+        cls.post = Post.objects.create(
+            text='Текст',
+            author=cls.user,
+            group=cls.group,
+        )
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': cls.user.username}),
+        )
+
+    def setUp(self):
+        page_cache().clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_anonymous_pages_served_from_cache(self):
+        """Повторная анонимная страница ленты не ходит в базу."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.guest_client.get(url)
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.guest_client.get(url)
+                self.assertEqual(data_queries(queries), [])
+                self.assertContains(response, self.post.text)
+
+    def test_unknown_params_share_cached_page(self):
+        """Лишние параметры запроса не создают новых записей в кеше."""
+        self.guest_client.get(self.urls[0])
+        with CaptureQueriesContext(connection) as queries:
+            self.guest_client.get(self.urls[0], {'utm': 'x', 'x': '1'})
+        self.assertEqual(data_queries(queries), [])
+
+    def test_new_post_purges_its_listings(self):
+        """Новый пост сбрасывает страницы лент, в которые попадает."""
+        for url in self.urls:
+            self.guest_client.get(url)
+        Post.objects.create(
+            text='Свежий пост', author=self.user, group=self.group
+        )
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertContains(self.guest_client.get(url), 'Свежий пост')
+
+    def test_authorized_pages_not_cached(self):
+        """Авторизованный посетитель не получает чужую страницу."""
+        self.guest_client.get(self.urls[0])
+        response = self.authorized_client.get(self.urls[0])
+        self.assertContains(response, self.user.username)
+        self.guest_client.get(self.urls[0])
+        response = self.guest_client.get(self.urls[0])
+        self.assertNotContains(response, 'Пользователь:')
+
+
+class ConditionalResponseTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='post_author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Название группы',
+            slug='slug',
+            description='Описание группы',
+        )
+        cls.post = Post.objects.create(
+            text='Текст',
+            author=cls.user,
+            group=cls.group,
+        )
+        cls.detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': cls.post.pk}
+        )
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': cls.user.username}),
+            cls.detail_url,
+        )
+
+    def setUp(self):
+        page_cache().clear()
+        self.client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_not_modified_without_rendering(self):
+        """Неизменная страница — 304 без шаблона и без списка постов."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                with self.assertNumQueries(2 if url == self.detail_url else 1):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+                self.assertFalse(response.templates)
+
+    def test_if_modified_since(self):
+        ListingVersion.objects.update(changed=timezone.now())
+        response = self.client.get(self.urls[0])
+        # Изменённая в эту секунду страница может измениться ещё раз.
+        self.assertFalse(response.has_header('Last-Modified'))
+        ListingVersion.objects.update(
+            changed=timezone.now() - timedelta(seconds=2)
+        )
+        response = self.client.get(self.urls[0])
+        response = self.client.get(
+            self.urls[0], HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_change_in_other_process(self):
+        """Версия ленты общая: её не держит кеш процесса."""
+        etag = self.client.get(self.urls[0])['ETag']
+        ListingVersion.objects.update(changed=timezone.now())
+        response = self.client.get(self.urls[0], HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_new_post_changes_listings(self):
+        etags = [self.client.get(url)['ETag'] for url in self.urls[:3]]
+        Post.objects.create(
+            text='Свежий пост', author=self.user, group=self.group
+        )
+        for url, etag in zip(self.urls, etags):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertContains(response, 'Свежий пост')
+
+    def test_listing_version_read_once(self):
+        """Оба декоратора страницы берут версию ленты одним запросом."""
+        for url in self.urls[:3]:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.get(url)
+                self.assertEqual(
+                    len(queries) - len(data_queries(queries)), 1
+                )
+
+    def test_comment_and_edit_change_post_page(self):
+        for change in (
+            lambda: Comment.objects.create(
+                post=self.post, author=self.reader, text='Комментарий'
+            ),
+            lambda: Comment.objects.filter(post=self.post).first().delete(),
+            lambda: self.user.save(),
+            lambda: Post.objects.get(pk=self.post.pk).save(),
+        ):
+            etag = self.client.get(self.detail_url)['ETag']
+            change()
+            response = self.client.get(
+                self.detail_url, HTTP_IF_NONE_MATCH=etag
+            )
+            self.assertEqual(response.status_code, 200)
+
+    def test_comment_keeps_post_updated(self):
+        """Комментарий не правка поста и не трогает Post.updated."""
+        updated = Post.objects.get(pk=self.post.pk).updated
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        self.assertEqual(Post.objects.get(pk=self.post.pk).updated, updated)
+
+    def test_private_pages_per_visitor(self):
+        """Страница с входом — своя для посетителя и private."""
+        etag = self.client.get(self.urls[2])['ETag']
+        response = self.reader_client.get(
+            self.urls[2], HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+        etag = response['ETag']
+        Follow.objects.create(user=self.reader, author=self.user)
+        response = self.reader_client.get(
+            self.urls[2], HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertContains(response, 'Отписаться')
+
+
+class GroupHeaderTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='post_author')
+        cls.group = Group.objects.create(
+            title='Название группы',
+            slug='slug',
+            description='Описание группы',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other',
+            description='Описание другой группы',
+        )
+
+    def setUp(self):
+        group_header_cache().clear()
+        page_cache().clear()
+        self.client = Client()
+        self.url = reverse('posts:group_list', kwargs={'slug': 'slug'})
+
+    def test_header_follows_posts(self):
+        """Счётчик и последняя публикация меняются вместе с постами."""
+        old = Post.objects.create(
+            text='Старый', author=self.user, group=self.group
+        )
+        Post.objects.filter(pk=old.pk).update(
+            pub_date=old.pub_date - timedelta(days=1)
+        )
+        new = Post.objects.create(
+            text='Новый', author=self.user, group=self.group
+        )
+        header = group_header('slug')
+        self.assertEqual(header.posts_count, 2)
+        self.assertEqual(header.last_activity, new.pub_date)
+        new.delete()
+        header = group_header('slug')
+        self.assertEqual(header.posts_count, 1)
+        self.assertEqual(
+            header.last_activity, old.pub_date - timedelta(days=1)
+        )
+        old = Post.objects.get(pk=old.pk)
+        old.group = self.other_group
+        old.save()
+        self.assertEqual(group_header('slug').posts_count, 0)
+        self.assertIsNone(group_header('slug').last_activity)
+        self.assertEqual(group_header('other').posts_count, 1)
+
+    def test_renamed_group(self):
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'renamed'
+        group.save()
+        self.assertIsNone(group_header('slug'))
+        self.assertEqual(group_header('renamed').title, 'Название группы')
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_stale_header_of_missing_group(self):
+        """Шапка, которую не сбросили в другом процессе, не даёт 200."""
+        Post.objects.create(text='Текст', author=self.user, group=self.group)
+        key = GROUP_HEADER_KEY.format('slug')
+        self.client.get(self.url)
+        cached = group_header_cache().get(key)
+        for change in (
+            lambda: Group.objects.filter(pk=self.group.pk).update(
+                slug='renamed'
+            ),
+            lambda: Group.objects.filter(pk=self.group.pk).delete(),
+        ):
+            # update() минует сигналы: версию ленты меняем, как save(),
+            # а кеш другого процесса по-прежнему держит старую шапку.
+            change()
+            touch_listings([GROUP_LISTING.format('slug')])
+            group_header_cache().set(key, cached)
+            self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    @override_settings(GROUP_HEADER_CACHE_TIMEOUT=0)
+    def test_header_expires(self):
+        group_header('slug')
+        self.assertIsNone(
+            group_header_cache().get(GROUP_HEADER_KEY.format('slug'))
+        )
+
+    def test_group_page_on_warm_cache(self):
+        """Страница группы с прогретой шапкой — версия ленты и посты."""
+        Post.objects.create(text='Текст', author=self.user, group=self.group)
+        self.client.get(self.url)
+        page_cache().clear()
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'Постов: 1')
+
+    def test_group_feed_paginates_all_posts(self):
+        for number in range(SELECT_LIMIT + 3):
+            Post.objects.create(
+                text=f'Пост {number}', author=self.user, group=self.group
+            )
+        first = self.client.get(self.url).context['page_obj']
+        second = self.client.get(
+            self.url, {'cursor': first.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(len(first) + len(second), SELECT_LIMIT + 3)
+        self.assertEqual(
+            GroupStats.objects.get(group=self.group).posts_count,
+            SELECT_LIMIT + 3,
+        )
@@ -0,0 +1,136 @@
+import os
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import AuthorStats, Comment, Follow, Group, Post, User
+from ..search import get_backend
+from ..timeline import timeline_page
+
+OLD_DATE = datetime(2015, 3, 1, 12, 0, tzinfo=timezone.utc)
+
+
+class ContentCommandsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='post_author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Название группы',
+            slug='slug',
+            description='Описание группы',
+        )
+        cls.post = Post.objects.create(
+            text='Малиновое варенье', author=cls.user, group=cls.group
+        )
+        Post.objects.filter(pk=cls.post.pk).update(pub_date=OLD_DATE)
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий'
+        )
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def roundtrip(self, name, *import_args):
+        path = os.path.join(self.tmp_dir.name, name)
+        call_command('export_content', path, stdout=StringIO())
+        Group.objects.all().delete()
+        Post.objects.all().delete()
+        call_command(
+            'import_content', path, '--chunk-size', '2', *import_args,
+            stdout=StringIO(),
+        )
+
+    def test_roundtrip_keeps_content(self):
+        """Выгрузка и загрузка сохраняют посты, даты, группы и комментарии."""
+        for name in ('content.jsonl', 'content.csv'):
+            with self.subTest(name=name):
+                self.roundtrip(name)
+                post = Post.objects.get(pk=self.post.pk)
+                self.assertEqual(post.text, 'Малиновое варенье')
+                self.assertEqual(post.pub_date, OLD_DATE)
+                self.assertEqual(post.author, self.user)
+                self.assertEqual(post.group.slug, 'slug')
+                self.assertEqual(
+                    list(post.comments.values_list('author', 'text')),
+                    [(self.reader.pk, 'Комментарий')],
+                )
+
+    def test_import_rebuilds_derived_data(self):
+        """После загрузки пересобраны счётчики, поиск и ленты подписок."""
+        Follow.objects.create(user=self.reader, author=self.user)
+        self.roundtrip('content.jsonl')
+        self.assertEqual(
+            AuthorStats.objects.get(author=self.user).posts_count, 1
+        )
+        self.assertEqual(get_backend().count('варенье'), 1)
+        self.assertEqual(
+            [post.pk for post in timeline_page(self.reader, 10)],
+            [self.post.pk],
+        )
+        new_post = Post.objects.create(text='Новый', author=self.user)
+        self.assertGreater(new_post.pk, self.post.pk)
+
+    @mock.patch('posts.content.LOOKUP_CACHE_SIZE', 0)
+    def test_lookup_caches_are_bounded(self):
+        """Словари авторов и групп не растут: загрузка та же."""
+        Follow.objects.create(user=self.reader, author=self.user)
+        self.roundtrip('content.jsonl')
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual((post.author, post.group.slug), (self.user, 'slug'))
+        self.assertEqual(
+            [post.pk for post in timeline_page(self.reader, 10)],
+            [self.post.pk],
+        )
+
+    def test_unknown_authors(self):
+        """Неизвестные авторы пропускаются или создаются по флагу."""
+        self.roundtrip('content.jsonl')
+        path = os.path.join(self.tmp_dir.name, 'new.jsonl')
+        with open(path, 'w', encoding='utf-8') as stream:
+            stream.write(
+                '{"model": "post", "text": "Чужой пост", "author": "new"}\n'
+            )
+        call_command('import_content', path, stdout=StringIO())
+        self.assertFalse(Post.objects.filter(text='Чужой пост'))
+        call_command(
+            'import_content', path, '--create-authors',
+            stdout=StringIO(),
+        )
+        author = User.objects.get(username='new')
+        self.assertFalse(author.has_usable_password())
+        self.assertTrue(Post.objects.filter(text='Чужой пост', author=author))
+
+    def test_bad_records_skipped(self):
+        """Занятый или нечисловой id и битые даты пропускаются."""
+        path = os.path.join(self.tmp_dir.name, 'bad.csv')
+        with open(path, 'w', encoding='utf-8') as stream:
+            stream.write(
+                'model,id,text,author,post,pub_date,created\n'
+                f'post,{self.post.pk},Занятый id,post_author,,,\n'
+                'post,abc,Нечисловой id,post_author,,,\n'
+                'post,,Битая дата,post_author,,2020-13-45T00:00:00,\n'
+                'post,,Хороший пост,post_author,,2016-01-01T00:00:00Z,\n'
+                'comment,,Ответ,reader,abc,,\n'
+                f'comment,,Старый ответ,reader,{self.post.pk},,'
+                '2016-01-02T00:00:00Z\n'
+            )
+        out = StringIO()
+        call_command('import_content', path, stdout=out)
+        self.assertIn(
+            'постов: 1, комментариев: 1, пропущено: 4', out.getvalue()
+        )
+        post = Post.objects.get(text='Хороший пост')
+        self.assertEqual(post.pub_date.year, 2016)
+        self.assertEqual(
+            Comment.objects.get(text='Старый ответ').created.year, 2016
+        )
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).text, 'Малиновое варенье'
+        )
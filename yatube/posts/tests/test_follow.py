@@ -0,0 +1,131 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import AuthorStats, Follow, Post, TimelineEntry, User
+from ..timeline import timeline_page
+from ..views import SELECT_LIMIT
+
+
+class FollowTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='post_author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.stranger = User.objects.create_user(username='stranger')
+        cls.old_post = Post.objects.create(
+            text='Старый пост', author=cls.author
+        )
+
+    def setUp(self):
+        # Отметки подтягивания постов звёзд живут в общем кеше.
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.follow_url = reverse(
+            'posts:profile_follow', kwargs={'username': 'post_author'}
+        )
+        self.unfollow_url = reverse(
+            'posts:profile_unfollow', kwargs={'username': 'post_author'}
+        )
+        self.feed_url = reverse('posts:follow_index')
+
+    def feed_texts(self, client):
+        response = client.get(self.feed_url)
+        return [post.text for post in response.context['page_obj']]
+
+    def test_follow_and_unfollow(self):
+        """Подписка подтягивает посты автора, отписка их убирает."""
+        self.reader_client.get(self.follow_url)
+        self.assertEqual(
+            AuthorStats.objects.get(author=self.author).followers_count, 1
+        )
+        self.assertEqual(self.feed_texts(self.reader_client), ['Старый пост'])
+        self.reader_client.get(self.unfollow_url)
+        self.assertEqual(self.feed_texts(self.reader_client), [])
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader))
+
+    def test_cannot_follow_self(self):
+        client = Client()
+        client.force_login(self.author)
+        client.get(self.follow_url)
+        self.assertFalse(Follow.objects.exists())
+
+    def test_new_post_fanned_out_to_followers_only(self):
+        """Новый пост попадает только в ленты подписчиков."""
+        self.reader_client.get(self.follow_url)
+        Post.objects.create(text='Свежий пост', author=self.author)
+        stranger_client = Client()
+        stranger_client.force_login(self.stranger)
+        self.assertEqual(
+            self.feed_texts(self.reader_client),
+            ['Свежий пост', 'Старый пост'],
+        )
+        self.assertEqual(self.feed_texts(stranger_client), [])
+
+    def test_deleted_post_leaves_feed(self):
+        self.reader_client.get(self.follow_url)
+        post = Post.objects.create(text='Удалённый пост', author=self.author)
+        post.delete()
+        self.assertEqual(self.feed_texts(self.reader_client), ['Старый пост'])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_celebrity_posts_pulled_on_read(self):
+        """Посты популярного автора не раскладываются, а читаются из ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.stranger, author=self.author)
+        post = Post.objects.create(text='Пост звезды', author=self.author)
+        self.assertFalse(TimelineEntry.objects.filter(post=post))
+        self.assertEqual(
+            self.feed_texts(self.reader_client),
+            ['Пост звезды', 'Старый пост'],
+        )
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.reader, post=post)
+        )
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_celebrity_pull_is_throttled(self):
+        """Повторное чтение ленты не ищет посты звёзд и не пишет в базу."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        timeline_page(self.reader, SELECT_LIMIT)
+        post = Post.objects.create(text='Пост звезды', author=self.author)
+        with self.assertNumQueries(2):
+            timeline_page(self.reader, SELECT_LIMIT)
+        cache.clear()
+        self.assertEqual(
+            [post.text for post in timeline_page(self.reader, SELECT_LIMIT)],
+            ['Пост звезды', 'Старый пост'],
+        )
+        follow = Follow.objects.get(user=self.reader)
+        self.assertEqual(follow.synced_at, post.pub_date)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_late_commit_not_skipped(self):
+        """Пост с датой раньше отметки, но в пределах перекрытия, попадает
+        в ленту."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        timeline_page(self.reader, SELECT_LIMIT)
+        follow = Follow.objects.get(user=self.reader)
+        late = Post.objects.create(text='Поздний пост', author=self.author)
+        Post.objects.filter(pk=late.pk).update(
+            pub_date=follow.synced_at - timedelta(seconds=10)
+        )
+        cache.clear()
+        texts = [post.text for post in timeline_page(self.reader, 20)]
+        self.assertIn('Поздний пост', texts)
+
+    def test_feed_page_queries(self):
+        """Следующая страница ленты: записи ленты и посты по ключу."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        for number in range(SELECT_LIMIT + 5):
+            Post.objects.create(text=f'Пост {number}', author=self.author)
+        first = timeline_page(self.reader, SELECT_LIMIT)
+        with self.assertNumQueries(2):
+            page = timeline_page(self.reader, SELECT_LIMIT, first.next_cursor)
+        self.assertEqual(len(page), 6)
+        self.assertFalse(page.has_next())
+        self.assertEqual(page[-1].text, 'Старый пост')
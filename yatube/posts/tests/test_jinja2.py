@@ -0,0 +1,73 @@
+from importlib.util import find_spec
+from unittest import skipUnless
+
+from django.conf import settings
+from django.template import engines
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ..cache import POST_CARD_TEMPLATE, page_cache, post_card_cache
+from ..models import Comment, Group, Post, User
+
+
+@skipUnless(find_spec('jinja2'), 'jinja2 не установлен')
+@override_settings(TEMPLATES=[settings.JINJA2_TEMPLATES, *settings.TEMPLATES])
+class Jinja2TemplatesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='post_author',
+            first_name='Лев',
+            last_name='Толстой',
+        )
+        cls.group = Group.objects.create(
+            title='Название группы',
+            slug='slug',
+            description='Описание группы',
+        )
+        cls.post = Post.objects.create(
+            text='Текст поста', author=cls.user, group=cls.group
+        )
+        Comment.objects.create(
+            post=cls.post, author=cls.user, text='Текст комментария'
+        )
+
+    def setUp(self):
+        post_card_cache().clear()
+        page_cache().clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_pages_rendered_by_jinja2(self):
+        """Страницы постов рендерятся шаблонами из templates_jinja2/."""
+        pages = {
+            reverse('posts:index'): 'Лев Толстой',
+            reverse('posts:group_list', kwargs={'slug': 'slug'}):
+                'Описание группы',
+            reverse('posts:profile', kwargs={'username': 'post_author'}):
+                'Всего постов: 1',
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}):
+                'Текст комментария',
+            reverse('posts:post_create'): 'csrfmiddlewaretoken',
+            reverse('posts:follow_index'): 'Подпишитесь на авторов',
+            reverse('posts:groups_index'): 'Всего постов: 1',
+        }
+        for url, text in pages.items():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, text)
+                self.assertContains(response, 'Пользователь: post_author')
+                self.assertContains(response, f'© {timezone.now().year}')
+
+    def test_post_card_matches_django_template(self):
+        """Карточка поста в Jinja2 совпадает с карточкой DjangoTemplates."""
+        post = Post.objects.for_feed().get(pk=self.post.pk)
+        cards = [
+            engine.get_template(POST_CARD_TEMPLATE).render({'post': post})
+            for engine in engines.all()
+        ]
+        jinja2_card, django_card = (card.split() for card in cards)
+        self.assertEqual(jinja2_card, django_card)
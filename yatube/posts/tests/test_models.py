@@ -1,7 +1,12 @@
+from io import StringIO
+from unittest import mock
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models import QuerySet
 from django.test import TestCase
 
-from ..models import Group, Post
+from ..models import AuthorStats, Group, GroupStats, Post
 
 User = get_user_model()
 
@@ -63,3 +68,88 @@ class PostModelTest(TestCase):
             with self.subTest(field=field):
                 self.assertEqual(post._meta.get_field(field).help_text,
                                  value)
+
+
+class AuthorStatsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.another_user = User.objects.create_user(username='another')
+
+    def posts_count(self, user):
+        return AuthorStats.posts_count_of(
+            User.objects.select_related('post_stats').get(pk=user.pk)
+        )
+
+    def test_counter_follows_create_and_delete(self):
+        """Счётчик растёт при создании поста и падает при удалении."""
+        self.assertEqual(self.posts_count(self.user), 0)
+        post = Post.objects.create(author=self.user, text='Пост')
+        Post.objects.create(author=self.user, text='Ещё пост')
+        self.assertEqual(self.posts_count(self.user), 2)
+        post.delete()
+        self.assertEqual(self.posts_count(self.user), 1)
+
+    def test_reassign_after_deferred_load(self):
+        """Автор, отложенный при загрузке, всё равно виден при save()."""
+        Post.objects.create(author=self.user, text='Пост')
+        post = Post.objects.only('text').get(author=self.user)
+        post.author = self.another_user
+        post.save()
+        self.assertEqual(self.posts_count(self.user), 0)
+        self.assertEqual(self.posts_count(self.another_user), 1)
+
+    def test_counter_follows_reassign(self):
+        """При смене автора пост переходит в счётчик нового автора."""
+        Post.objects.create(author=self.user, text='Пост')
+        post = Post.objects.get(author=self.user)
+        post.author = self.another_user
+        post.save()
+        self.assertEqual(self.posts_count(self.user), 0)
+        self.assertEqual(self.posts_count(self.another_user), 1)
+
+    def test_rebuild_command(self):
+        """Команда rebuild_author_stats восстанавливает счётчики."""
+        Post.objects.create(author=self.user, text='Пост')
+        Post.objects.create(author=self.another_user, text='Пост')
+        AuthorStats.objects.all().delete()
+        call_command('rebuild_author_stats', stdout=StringIO())
+        self.assertEqual(self.posts_count(self.user), 1)
+        self.assertEqual(self.posts_count(self.another_user), 1)
+
+    def test_counter_survives_concurrent_create(self):
+        """Строку успел создать другой запрос: счётчик всё равно растёт."""
+        Post.objects.create(author=self.user, text='Пост')
+        real_update = QuerySet.update
+        calls = []
+
+        def update(queryset, **kwargs):
+            calls.append(kwargs)
+            # Первый UPDATE «не видит» строку параллельного запроса.
+            return 0 if len(calls) == 1 else real_update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', update):
+            AuthorStats.change_posts_count(self.user.pk, 1)
+        self.assertEqual(self.posts_count(self.user), 2)
+
+
+class GroupStatsTest(TestCase):
+    def test_counter_survives_concurrent_create(self):
+        """Строку успел создать другой запрос: счётчик всё равно растёт."""
+        user = User.objects.create_user(username='auth')
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        Post.objects.create(author=user, group=group, text='Пост')
+        real_update = QuerySet.update
+        calls = []
+
+        def update(queryset, **kwargs):
+            calls.append(kwargs)
+            # Первый UPDATE «не видит» строку параллельного запроса.
+            return 0 if len(calls) == 1 else real_update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', update):
+            GroupStats.change_posts_count(group.pk, 1)
+        self.assertEqual(GroupStats.objects.get(group=group).posts_count, 2)
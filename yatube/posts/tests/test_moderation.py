@@ -0,0 +1,149 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..cache import INDEX_LISTING, group_header, listing_version
+from ..models import (AuthorStats, Comment, Follow, Group, GroupStats, Post,
+                      TimelineEntry, User)
+from ..moderation import delete_authors_posts
+from ..search import get_backend as get_search_backend
+from .test_thumbnails import SMALL_GIF
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    THUMBNAIL_ASYNC=False,
+    MODERATION_BATCH_SIZE=2,
+)
+class ModerationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.spammer = User.objects.create_user(username='spammer')
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description=''
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа', slug='other-slug', description=''
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        Follow.objects.create(user=self.reader, author=self.spammer)
+        self.spam = [
+            Post.objects.create(
+                text=f'Спам {number}', author=self.spammer, group=self.group
+            )
+            for number in range(3)
+        ]
+        self.spam[0].image = SimpleUploadedFile(
+            name='spam.gif', content=SMALL_GIF, content_type='image/gif'
+        )
+        self.spam[0].save()
+        self.post = Post.objects.create(
+            text='Обычный пост', author=self.author, group=self.group
+        )
+        for post in (self.spam[0], self.post):
+            Comment.objects.create(post=post, author=self.reader, text='Ок')
+        self.client = Client()
+        self.client.force_login(self.admin)
+        self.url = reverse('admin:posts_post_changelist')
+
+    def run_action(self, action, posts, **data):
+        return self.client.post(self.url, {
+            'action': action,
+            '_selected_action': [post.pk for post in posts],
+            **data,
+        }, follow=True)
+
+    def test_delete_authors_posts(self):
+        image = self.spam[0].image.name
+        index_version = listing_version(INDEX_LISTING)
+        counts = delete_authors_posts(Post.objects.filter(pk=self.spam[1].pk))
+        self.assertEqual(
+            counts,
+            {'batches': 2, 'posts': 3, 'comments': 1, 'files': 1},
+        )
+        self.assertEqual(list(Post.objects.all()), [self.post])
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertFalse(default_storage.exists(image))
+        self.assertEqual(get_search_backend().count('Спам'), 0)
+        self.assertEqual(AuthorStats.posts_count_of(self.spammer), 0)
+        self.assertEqual(group_header('test-slug').posts_count, 1)
+        self.assertNotEqual(listing_version(INDEX_LISTING), index_version)
+
+    def test_delete_posts_replaces_delete_selected(self):
+        response = self.run_action('delete_selected', self.spam)
+        self.assertEqual(Post.objects.count(), 4)
+        response = self.run_action(
+            'delete_posts', self.spam[:2], confirm='yes'
+        )
+        self.assertContains(response, 'Постов: 2')
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(
+            GroupStats.objects.get(group=self.group).posts_count, 2
+        )
+
+    def test_confirmation_page(self):
+        """Удаление сначала показывает, сколько строк затронет."""
+        response = self.run_action('delete_authors_posts', self.spam[1:2])
+        self.assertTemplateUsed(
+            response, 'admin/posts/post/moderation_confirmation.html'
+        )
+        self.assertContains(response, 'Постов: 3')
+        self.assertContains(response, 'Комментариев: 1')
+        self.assertContains(response, 'name="confirm"')
+        self.assertEqual(Post.objects.count(), 4)
+        response = self.client.post(self.url, {
+            'action': 'delete_authors_posts',
+            '_selected_action': [self.spam[1].pk],
+            'select_across': '0',
+            'confirm': 'yes',
+        }, follow=True)
+        self.assertContains(response, 'Постов: 3')
+        self.assertEqual(list(Post.objects.all()), [self.post])
+
+    def test_reassign_group(self):
+        response = self.run_action(
+            'reassign_group', self.spam, group='other-slug'
+        )
+        self.assertContains(response, 'Постов: 3')
+        self.assertEqual(
+            Post.objects.filter(group=self.other_group).count(), 3
+        )
+        self.assertEqual(group_header('test-slug').posts_count, 1)
+        self.assertEqual(group_header('other-slug').posts_count, 3)
+        response = self.run_action(
+            'reassign_group', [self.post], group='missing'
+        )
+        self.assertContains(response, 'Укажите slug существующей группы')
+        self.assertEqual(Post.objects.get(pk=self.post.pk).group, self.group)
+
+    def test_purge_comments(self):
+        updated = Post.objects.get(pk=self.spam[0].pk).updated
+        response = self.run_action('purge_comments', self.spam, confirm='yes')
+        self.assertContains(response, 'комментариев: 1')
+        self.assertEqual(
+            list(Comment.objects.values_list('post', flat=True)),
+            [self.post.pk],
+        )
+        # Комментарии не правка поста: страницу меняет их число.
+        self.assertEqual(Post.objects.get(pk=self.spam[0].pk).updated,
+                         updated)
@@ -0,0 +1,75 @@
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Post, User
+from ..paginators import CursorPaginator
+from ..views import SELECT_LIMIT
+
+POSTS_COUNT = 25
+
+
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='post_author')
+        for number in range(POSTS_COUNT):
+            Post.objects.create(
+                text=f'Пост {number}',
+                author=cls.user,
+            )
+        cls.expected_ids = list(
+            Post.objects.order_by('-pub_date', '-id')
+            .values_list('id', flat=True)
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_walk_forward_and_back(self):
+        """Курсоры проходят ленту целиком в обе стороны без пропусков."""
+        paginator = CursorPaginator(Post.objects.all(), SELECT_LIMIT)
+        pages = [paginator.cursor_page()]
+        while pages[-1].has_next():
+            pages.append(paginator.cursor_page(pages[-1].next_cursor))
+        ids = [post.id for page in pages for post in page]
+        self.assertEqual(ids, self.expected_ids)
+        self.assertFalse(pages[0].has_previous())
+
+        back = [pages[-1]]
+        while back[-1].has_previous():
+            back.append(paginator.cursor_page(back[-1].previous_cursor))
+        self.assertEqual(
+            [post.id for post in back[-1]],
+            [post.id for post in pages[0]],
+        )
+
+    def test_deep_page_without_count(self):
+        """Страница по курсору стоит один запрос и не считает COUNT(*)."""
+        paginator = CursorPaginator(Post.objects.all(), SELECT_LIMIT)
+        cursor = paginator.cursor_page().next_cursor
+        paginator = CursorPaginator(Post.objects.all(), SELECT_LIMIT)
+        with self.assertNumQueries(1):
+            page = paginator.cursor_page(cursor)
+            list(page)
+        self.assertEqual(len(page), SELECT_LIMIT)
+
+    def test_broken_cursor_gives_first_page(self):
+        """Испорченный курсор не роняет страницу."""
+        response = self.guest_client.get(
+            reverse('posts:index'), {'cursor': 'не-курсор'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [post.id for post in response.context['page_obj']],
+            self.expected_ids[:SELECT_LIMIT],
+        )
+
+    def test_legacy_page_number(self):
+        """Старые ссылки ?page=N продолжают работать."""
+        response = self.guest_client.get(reverse('posts:index'), {'page': 3})
+        self.assertEqual(response.context['page_obj'].number, 3)
+        self.assertEqual(
+            [post.id for post in response.context['page_obj']],
+            self.expected_ids[2 * SELECT_LIMIT:],
+        )
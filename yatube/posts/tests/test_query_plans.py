@@ -0,0 +1,95 @@
+import re
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..cache import page_cache
+from ..models import Comment, Follow, Group, Post, User
+
+# Полный просмотр таблицы без индекса и сортировка во временном B-дереве.
+FULL_SCAN_RE = re.compile(r'^SCAN (TABLE )?\w+(?: AS \w+)?$')
+TEMP_SORT_RE = re.compile(r'USE TEMP B-TREE')
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN из SQLite')
+class QueryPlanTests(TestCase):
+    """Каждый запрос страниц ленты и поста идёт по индексу."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='post_author')
+        cls.group = Group.objects.create(
+            title='Название группы',
+            slug='slug',
+            description='Описание группы',
+        )
+        for number in range(15):
+            post = Post.objects.create(
+                text=f'Пост номер {number}',
+                author=cls.user,
+                group=cls.group,
+            )
+            Comment.objects.create(
+                post=post, author=cls.user, text='Комментарий'
+            )
+        cls.post = post
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def next_page_url(self, url):
+        response = self.guest_client.get(url)
+        return f"{url}?cursor={response.context['page_obj'].next_cursor}"
+
+    def urls(self):
+        index = reverse('posts:index')
+        group = reverse('posts:group_list', kwargs={'slug': 'slug'})
+        profile = reverse(
+            'posts:profile', kwargs={'username': self.user.username}
+        )
+        return [
+            index,
+            self.next_page_url(index),
+            group,
+            self.next_page_url(group),
+            profile,
+            self.next_page_url(profile),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('posts:search') + '?q=номер',
+        ]
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertIndexedQueries(self, client, url):
+        page_cache().clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        for query in queries:
+            if not query['sql'].startswith('SELECT'):
+                continue
+            for step in self.explain(query['sql']):
+                with self.subTest(url=url, step=step, sql=query['sql']):
+                    self.assertNotRegex(step, FULL_SCAN_RE)
+                    self.assertNotRegex(step, TEMP_SORT_RE)
+
+    def test_views_use_indexes(self):
+        for url in self.urls():
+            self.assertIndexedQueries(self.guest_client, url)
+
+    def test_follow_feed_uses_indexes(self):
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.user)
+        client = Client()
+        client.force_login(reader)
+        url = reverse('posts:follow_index')
+        self.assertIndexedQueries(client, url)
+        cursor = client.get(url).context['page_obj'].next_cursor
+        self.assertIndexedQueries(client, f'{url}?cursor={cursor}')
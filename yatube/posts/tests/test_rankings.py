@@ -0,0 +1,85 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Comment, Group, GroupRanking, Post, User
+from ..rankings import compute_rankings
+
+
+class GroupRankingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='post_author')
+        cls.quiet = Group.objects.create(
+            title='Тихая группа', slug='quiet', description='Давно молчит'
+        )
+        cls.busy = Group.objects.create(
+            title='Шумная группа', slug='busy', description='Пишут сегодня'
+        )
+        month_ago = timezone.now() - timedelta(days=20)
+        for number in range(3):
+            post = Post.objects.create(
+                text=f'Старый пост {number}', author=cls.user, group=cls.quiet
+            )
+            Post.objects.filter(pk=post.pk).update(pub_date=month_ago)
+        post = Post.objects.create(
+            text='Свежий пост', author=cls.user, group=cls.busy
+        )
+        Comment.objects.create(post=post, author=cls.user, text='Ответ')
+
+    def setUp(self):
+        self.client = Client()
+        self.url = reverse('posts:groups_index')
+
+    def titles(self, sort):
+        response = self.client.get(self.url, {'sort': sort})
+        return [group.title for group in response.context['page_obj']]
+
+    def test_windows_rank_by_recent_activity(self):
+        compute_rankings()
+        ranking = GroupRanking.objects.get(window='day', group=self.busy)
+        self.assertEqual(
+            (ranking.rank, ranking.posts_count, ranking.comments_count),
+            (1, 1, 1),
+        )
+        self.assertEqual(self.titles('day'), ['Шумная группа', 'Тихая группа'])
+        self.assertEqual(
+            self.titles('month'), ['Тихая группа', 'Шумная группа']
+        )
+        self.assertEqual(
+            self.titles('posts'), ['Тихая группа', 'Шумная группа']
+        )
+
+    def test_directory_does_not_group_posts(self):
+        """Каталог читает готовые места: счётчик и страница групп."""
+        compute_rankings()
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {'sort': 'week'})
+        self.assertContains(response, 'постов 1, комментариев 1')
+
+    def test_new_group_listed_before_recompute(self):
+        compute_rankings()
+        Group.objects.create(title='Новая группа', slug='new', description='')
+        self.assertEqual(self.titles('day')[-1], 'Новая группа')
+        self.assertEqual(self.titles('unknown')[-1], 'Новая группа')
+
+    def test_command_replaces_window(self):
+        call_command('compute_group_rankings', stdout=StringIO())
+        call_command(
+            'compute_group_rankings', '--windows', 'day', stdout=StringIO()
+        )
+        self.assertEqual(GroupRanking.objects.filter(window='day').count(), 2)
+        self.assertEqual(GroupRanking.objects.count(), 6)
+
+    def test_admin_lists_group_stats(self):
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        self.client.force_login(admin)
+        response = self.client.get(reverse('admin:posts_group_changelist'))
+        self.assertContains(response, 'Тихая группа')
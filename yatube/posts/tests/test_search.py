@@ -0,0 +1,57 @@
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Post, User
+from ..search import get_backend
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='post_author')
+        cls.post = Post.objects.create(
+            text='Сегодня варили малиновое варенье',
+            author=cls.user,
+        )
+        Post.objects.create(text='Погода была пасмурной', author=cls.user)
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def search(self, query):
+        response = self.guest_client.get(reverse('posts:search'), {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [post.pk for post in response.context['page_obj']]
+
+    def test_search_finds_words(self):
+        """Поиск находит пост по словам текста."""
+        self.assertEqual(self.search('малиновое варенье'), [self.post.pk])
+
+    def test_index_follows_edits_and_deletes(self):
+        """Индекс обновляется при правке и удалении поста."""
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Сегодня варили клубничный джем'
+        post.save()
+        self.assertEqual(self.search('варенье'), [])
+        self.assertEqual(self.search('джем'), [post.pk])
+        post.delete()
+        self.assertEqual(self.search('джем'), [])
+
+    def test_no_matches_shows_empty_state(self):
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': 'клубника'}
+        )
+        self.assertContains(response, 'Найдено постов: 0')
+        self.assertContains(response, 'ничего не найдено')
+
+    def test_query_syntax_is_not_executed(self):
+        """Спецсимволы запроса не ломают поиск."""
+        self.assertEqual(self.search('варенье" ^*('), [self.post.pk])
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке отбирает посты через индекс."""
+        queryset = get_backend().filter_queryset(
+            Post.objects.all(), 'пасмурной'
+        )
+        self.assertEqual(queryset.count(), 1)
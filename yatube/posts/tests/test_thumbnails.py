@@ -0,0 +1,83 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Post, User
+from ..thumbnails import VARIANT_WIDTHS, generate_thumbnail
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='post_author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.post = Post.objects.create(
+            text='Пост с картинкой',
+            author=self.user,
+            image=SimpleUploadedFile(
+                name='small.gif',
+                content=SMALL_GIF,
+                content_type='image/gif'
+            ),
+        )
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.url = reverse('posts:post_detail', args=[self.post.pk])
+
+    def test_pending_thumbnail_falls_back_to_image(self):
+        """Пока миниатюры нет, страница показывает исходную картинку."""
+        response = self.authorized_client.get(self.url)
+        self.assertContains(response, self.post.image.url)
+
+    def test_generated_thumbnail_is_shown(self):
+        """Готовая миниатюра сохраняется в пост и выводится в шаблон."""
+        name = generate_thumbnail(self.post.pk)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.image_thumbnail, name)
+        response = self.authorized_client.get(self.url)
+        self.assertContains(response, self.post.thumbnail_url)
+
+    def test_variants_in_srcset(self):
+        """Для каждой ширины есть WebP и JPEG, шаблон выводит srcset."""
+        generate_thumbnail(self.post.pk)
+        self.post.refresh_from_db()
+        variants = self.post.variants
+        self.assertEqual(
+            {(variant['width'], variant['type']) for variant in variants},
+            {(width, mime_type) for width in VARIANT_WIDTHS
+             for mime_type in ('image/webp', 'image/jpeg')},
+        )
+        response = self.authorized_client.get(self.url)
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, self.post.image_srcset['jpeg'])
+
+    def test_backfill_command(self):
+        """Команда generate_thumbnails догоняет посты без миниатюр."""
+        call_command('generate_thumbnails', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertTrue(self.post.image_thumbnail)
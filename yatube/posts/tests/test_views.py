@@ -1,8 +1,11 @@
 from django import forms
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Post, Group, User
+from ..models import Comment, Post, Group, User
+from ..views import COMMENTS_LIMIT
 
 
 class PostPagesTests(TestCase):
@@ -189,3 +192,128 @@ class PostPagesTests(TestCase):
             self.assertEqual(post_count + 1, post_count1)
             Post.objects.filter(
                 text='Текст для нового поста').delete()
+
+
+class FeedQueriesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(
+            username='post_author',
+            first_name='Имя',
+            last_name='Фамилия',
+        )
+        cls.commentator = User.objects.create(username='commentator')
+        cls.group = Group.objects.create(
+            title='Название группы',
+            slug='slug',
+            description='Описание группы',
+        )
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': cls.user.username}),
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def create_posts(self, count):
+        for number in range(count):
+            post = Post.objects.create(
+                text=f'Пост {number}',
+                author=self.user,
+                group=self.group,
+            )
+            Comment.objects.create(
+                post=post,
+                author=self.commentator,
+                text='Комментарий',
+            )
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), len(response.context['page_obj'])
+
+    def test_feed_queries_do_not_grow_with_posts(self):
+        """Число запросов ленты не зависит от числа постов на странице."""
+        self.create_posts(1)
+        for url in self.urls:
+            with self.subTest(url=url):
+                queries, shown = self.count_queries(url)
+                self.create_posts(9)
+                more_queries, more_shown = self.count_queries(url)
+                self.assertGreater(more_shown, shown)
+                self.assertEqual(more_queries, queries)
+                Post.objects.exclude(pk=Post.objects.first().pk).delete()
+
+    def test_feed_annotates_comment_count(self):
+        """Лента знает число комментариев без запроса на каждый пост."""
+        self.create_posts(1)
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertEqual(response.context['page_obj'][0].comment_count, 1)
+
+
+class CommentPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='post_author')
+        cls.post = Post.objects.create(text='Текст', author=cls.user)
+        for number in range(COMMENTS_LIMIT + 5):
+            commentator = User.objects.create(username=f'reader_{number}')
+            Comment.objects.create(
+                post=cls.post,
+                author=commentator,
+                text=f'Комментарий {number}',
+            )
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_post_detail_shows_first_comments(self):
+        """На странице поста только первая порция комментариев."""
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_LIMIT)
+        self.assertEqual(comments[0].text, 'Комментарий 0')
+        self.assertTrue(comments.has_next())
+
+    def test_load_more_fragment(self):
+        """Фрагмент подгружает остаток одним запросом с авторами."""
+        first = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        ).context['comments']
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.pk})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(
+                url, {'cursor': first.next_cursor}
+            )
+        self.assertTemplateUsed(response, 'includes/comments.html')
+        self.assertEqual(len(response.context['comments']), 5)
+        self.assertContains(response, 'reader_24')
+        self.assertFalse(response.context['comments'].has_next())
+        self.assertEqual(len(queries), 2)
+
+    def test_load_more_rejects_bad_cursor(self):
+        """Битый курсор не подгружает первую страницу повторно."""
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.pk})
+        for params in ({}, {'cursor': 'мусор'}):
+            with self.subTest(params=params):
+                response = self.guest_client.get(url, params)
+                self.assertEqual(response.status_code, 400)
+
+    def test_load_more_after_deleted_comments_is_empty(self):
+        first = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        ).context['comments']
+        Comment.objects.filter(post=self.post).delete()
+        response = self.guest_client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.pk}),
+            {'cursor': first.next_cursor},
+        )
+        self.assertEqual(len(response.context['comments']), 0)
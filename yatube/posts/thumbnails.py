@@ -0,0 +1,149 @@
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+from core.sqlite import write_lock
+
+from .cache import invalidate_post_cards
+from .models import Post
+from .signals import touch_post_listings
+
+# Пропорции карточки: 960x339, как у прежней миниатюры sorl.
+THUMBNAIL_WIDTH = 960
+THUMBNAIL_HEIGHT = 339
+VARIANT_WIDTHS = (480, 960, 1440)
+VARIANT_FORMATS = (
+    # (расширение, формат Pillow, MIME-тип, параметры сохранения)
+    ('webp', 'WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    ('jpg', 'JPEG', 'image/jpeg', {'quality': 85, 'optimize': True}),
+)
+VARIANTS_DIR = 'posts/variants/{}/'
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_executor():
+    """Локальный пул потоков для обработки картинок вне запроса."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def variant_formats():
+    return [fmt for fmt in VARIANT_FORMATS
+            if fmt[1] != 'WEBP' or features.check('webp')]
+
+
+def crop_to_card(image):
+    """Обрезать по центру до пропорций карточки, не масштабируя."""
+    width = max(1, min(
+        image.width, round(image.height * THUMBNAIL_WIDTH / THUMBNAIL_HEIGHT)
+    ))
+    height = max(1, min(
+        image.height, round(image.width * THUMBNAIL_HEIGHT / THUMBNAIL_WIDTH)
+    ))
+    left = (image.width - width) // 2
+    top = (image.height - height) // 2
+    return image.crop((left, top, left + width, top + height))
+
+
+def build_variants(post):
+    """Нарезать картинку поста по ширинам и форматам.
+
+    Файл декодируется один раз; каждая ширина масштабируется из уже
+    обрезанного по пропорциям карточки изображения и сохраняется
+    во всех форматах. Возвращает метаданные для ``Post.image_variants``.
+    """
+    with post.image.open('rb') as image_file:
+        image = Image.open(image_file)
+        image = ImageOps.exif_transpose(image).convert('RGB')
+    image = crop_to_card(image)
+    variants = []
+    for width in sorted(VARIANT_WIDTHS, reverse=True):
+        height = round(width * THUMBNAIL_HEIGHT / THUMBNAIL_WIDTH)
+        resized = image.resize((width, height), Image.LANCZOS)
+        for extension, pillow_format, mime_type, options in variant_formats():
+            buffer = BytesIO()
+            resized.save(buffer, pillow_format, **options)
+            name = default_storage.save(
+                VARIANTS_DIR.format(post.pk) + f'{width}.{extension}',
+                ContentFile(buffer.getvalue()),
+            )
+            variants.append({
+                'name': name,
+                'width': width,
+                'height': height,
+                'type': mime_type,
+            })
+    return variants
+
+
+def generate_thumbnail(post_id):
+    """Сделать варианты картинки поста и записать их в пост.
+
+    Возвращает имя основной миниатюры (JPEG шириной 960) или None,
+    если картинки у поста нет.
+    """
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image:
+        return None
+    variants = build_variants(post)
+    thumbnail = next(
+        variant['name'] for variant in variants
+        if variant['width'] == THUMBNAIL_WIDTH
+        and variant['type'] == 'image/jpeg'
+    )
+    # Картинку могли заменить, пока варианты считались.
+    with write_lock():
+        updated = Post.objects.filter(
+            pk=post_id, image=post.image.name
+        ).update(
+            image_thumbnail=thumbnail,
+            image_variants=json.dumps(variants),
+            updated=timezone.now(),
+        )
+    stale = post.variants if updated else variants
+    for variant in stale:
+        default_storage.delete(variant['name'])
+    if not updated:
+        return None
+    invalidate_post_cards([post_id])
+    touch_post_listings([post.author_id], [post.group_id])
+    return thumbnail
+
+
+def run_thumbnail_job(post_id):
+    close_old_connections()
+    try:
+        return generate_thumbnail(post_id)
+    except Exception:
+        logger.exception('Не удалось сделать миниатюру поста %s', post_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_thumbnail(post):
+    """Поставить миниатюру в очередь после коммита транзакции."""
+    if not post.image or post.image_thumbnail:
+        return
+    post_id = post.pk
+    if settings.THUMBNAIL_ASYNC:
+        transaction.on_commit(
+            lambda: get_executor().submit(run_thumbnail_job, post_id)
+        )
+    else:
+        transaction.on_commit(lambda: run_thumbnail_job(post_id))
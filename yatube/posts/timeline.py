@@ -0,0 +1,180 @@
+"""Личная лента подписок.
+
+Посты раскладываются по лентам подписчиков при публикации
+(fan-out on write). Авторы, у которых подписчиков больше
+``settings.TIMELINE_FANOUT_LIMIT``, при публикации не раскладываются:
+их новые посты подтягиваются в ленту подписчика при её чтении,
+начиная с ``Follow.synced_at``.
+"""
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+from core.sqlite import write_lock
+
+from .models import AuthorStats, Follow, Post, TimelineEntry
+from .paginators import CursorPaginator
+
+TIMELINE_PULL_KEY = 'timeline_pull:{}'
+
+
+def is_celebrity(author_id):
+    return (
+        AuthorStats.followers_count_of(author_id)
+        > settings.TIMELINE_FANOUT_LIMIT
+    )
+
+
+def add_entries(entries):
+    TimelineEntry.objects.bulk_create(
+        entries,
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def fan_out(post):
+    """Разложить пост по лентам подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return
+    followers = Follow.objects.filter(author_id=post.author_id).values_list(
+        'user_id', flat=True
+    )
+    batch = []
+    for user_id in followers.iterator():
+        batch.append(TimelineEntry(
+            user_id=user_id,
+            post_id=post.pk,
+            author_id=post.author_id,
+            pub_date=post.pub_date,
+        ))
+        if len(batch) >= settings.TIMELINE_BATCH_SIZE:
+            add_entries(batch)
+            batch = []
+    if batch:
+        add_entries(batch)
+
+
+def reassign(post):
+    """Пост перешёл к другому автору: ленты строятся заново."""
+    TimelineEntry.objects.filter(post_id=post.pk).delete()
+    fan_out(post)
+
+
+def recent_posts(condition):
+    return (
+        Post.objects.filter(condition)
+        .order_by('-pub_date', '-id')
+        .values_list('pk', 'author_id', 'pub_date')
+        [:settings.TIMELINE_BACKFILL]
+    )
+
+
+def backfill(follow):
+    """Новая подписка: последние посты автора сразу попадают в ленту."""
+    add_entries([
+        TimelineEntry(
+            user_id=follow.user_id,
+            post_id=post_id,
+            author_id=author_id,
+            pub_date=pub_date,
+        )
+        for post_id, author_id, pub_date in recent_posts(
+            Q(author_id=follow.author_id)
+        )
+    ])
+
+
+def refresh_followers(author_ids):
+    """Дозаполнить ленты подписчиков после массовой загрузки постов."""
+    follows = Follow.objects.filter(author_id__in=author_ids)
+    for follow in follows.iterator():
+        backfill(follow)
+
+
+def remove(follow):
+    TimelineEntry.objects.filter(
+        user_id=follow.user_id, author_id=follow.author_id
+    ).delete()
+
+
+def pull_celebrity_posts(user):
+    """Подтянуть в ленту новые посты авторов без раскладки при публикации.
+
+    Подтягивание идёт не чаще раза в ``TIMELINE_PULL_INTERVAL`` секунд
+    на подписчика, а в базу пишет, только если нашлись новые посты.
+    Берётся не больше ``TIMELINE_BACKFILL`` самых свежих постов: лента
+    подписок не обязана хранить всю историю. ``Follow.synced_at`` —
+    дата самого нового подтянутого поста; посты за
+    ``TIMELINE_PULL_OVERLAP`` секунд до неё перечитываются, чтобы
+    не потерять пост, закоммиченный позже более новых.
+    """
+    if not cache.add(
+        TIMELINE_PULL_KEY.format(user.pk), True,
+        settings.TIMELINE_PULL_INTERVAL,
+    ):
+        return
+    follows = list(
+        Follow.objects.filter(
+            user=user,
+            author__post_stats__followers_count__gt=(
+                settings.TIMELINE_FANOUT_LIMIT
+            ),
+        ).values_list('author_id', 'synced_at')
+    )
+    if not follows:
+        return
+    overlap = timedelta(seconds=settings.TIMELINE_PULL_OVERLAP)
+    condition = reduce(or_, (
+        Q(author_id=author_id, pub_date__gt=synced_at - overlap)
+        for author_id, synced_at in follows
+    ))
+    posts = list(recent_posts(condition))
+    pulled = set(TimelineEntry.objects.filter(
+        user=user, post_id__in=[post_id for post_id, _, _ in posts]
+    ).values_list('post_id', flat=True))
+    posts = [post for post in posts if post[0] not in pulled]
+    if not posts:
+        return
+    latest = {}
+    for _, author_id, pub_date in posts:
+        latest[author_id] = max(latest.get(author_id, pub_date), pub_date)
+    with write_lock():
+        add_entries([
+            TimelineEntry(
+                user_id=user.pk,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for post_id, author_id, pub_date in posts
+        ])
+        for author_id, pub_date in latest.items():
+            Follow.objects.filter(
+                user=user, author_id=author_id, synced_at__lt=pub_date
+            ).update(synced_at=pub_date)
+
+
+def timeline_page(user, per_page, cursor=None):
+    """Страница ленты подписок: посты в порядке публикации.
+
+    Курсор строится по записям ленты, а сами посты догружаются
+    по первичному ключу одним запросом.
+    """
+    pull_celebrity_posts(user)
+    entries = TimelineEntry.objects.filter(user=user).only(
+        'pub_date', 'post'
+    )
+    page = CursorPaginator(
+        entries, per_page, keys=('-pub_date', '-post_id')
+    ).cursor_page(cursor)
+    post_ids = [entry.post_id for entry in page]
+    posts = Post.objects.for_feed().in_bulk(post_ids)
+    page.object_list = [
+        posts[post_id] for post_id in post_ids if post_id in posts
+    ]
+    return page
@@ -1,24 +1,91 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.db.models import Count, Max
+from django.http import Http404, HttpResponseBadRequest
 from django.shortcuts import render, get_object_or_404, redirect
+from django.utils.http import urlencode
 
+from core.ratelimit import ratelimit
+from core.sqlite import write_lock
+
+from .cache import (GROUP_LISTING, INDEX_LISTING, PROFILE_LISTING,
+                    cache_anonymous_page, conditional_page, group_header,
+                    listing_version, listing_versions, page_validators)
 from .forms import PostForm, CommentForm
-from .models import Post, Group, User, Comment
+from .models import AuthorStats, Follow, Post, User, Comment
+from .paginators import CursorPaginator
+from .rankings import ranked_groups, sorts
+from .search import SearchResults
+from .thumbnails import schedule_thumbnail
+from .timeline import timeline_page
 
 SELECT_LIMIT = 10  # лимит постов на странице
+GROUPS_LIMIT = 20  # лимит групп на странице каталога
+COMMENTS_LIMIT = 20  # лимит комментариев на странице поста
 
 
 def paginator(request, posts):
-    paginator = Paginator(posts, SELECT_LIMIT)
+    paginator = CursorPaginator(posts, SELECT_LIMIT)
     page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return page
+    if page_number is not None:
+        # Совместимость со старыми ссылками вида ?page=N.
+        return paginator.get_page(page_number)
+    return paginator.cursor_page(request.GET.get('cursor'))
+
+
+def listing_validators(listing):
+    """Свежесть ленты — версия из touch_listings, один запрос к базе."""
+    def validators(request, *args, **kwargs):
+        return page_validators(
+            request, [listing_version(listing(*args, **kwargs), request)]
+        )
+    return validators
+
+
+def profile_validators(request, username):
+    following = (
+        request.user.is_authenticated
+        and Follow.objects.filter(
+            user=request.user, author__username=username
+        ).exists()
+    )
+    return page_validators(
+        request,
+        [listing_version(PROFILE_LISTING.format(username), request)],
+        following,
+    )
+
 
+def post_detail_validators(request, post_id):
+    """Правки поста меняют Post.updated, комментарии — их число и время
+    последнего, число постов и имя автора, название группы — версии
+    их лент."""
+    # Без order_by(): сортировка ленты заставила бы сортировать группу.
+    rows = Post.objects.filter(id=post_id).order_by().values(
+        'updated', 'author__username', 'group__slug'
+    ).annotate(
+        comments_count=Count('comments'),
+        last_comment=Max('comments__created'),
+    )
+    if not rows:
+        return None
+    post = rows[0]
+    listings = [PROFILE_LISTING.format(post['author__username'])]
+    if post['group__slug']:
+        listings.append(GROUP_LISTING.format(post['group__slug']))
+    versions = [post['updated'].timestamp(), *listing_versions(listings)]
+    if post['last_comment'] is not None:
+        versions.append(post['last_comment'].timestamp())
+    return page_validators(request, versions, post['comments_count'])
 
+
+@conditional_page(listing_validators(lambda: INDEX_LISTING))
+@cache_anonymous_page('index', lambda: INDEX_LISTING)
 def index(request):
     """Главная страница проекта yatube."""
 
-    posts = Post.objects.all()
+    posts = Post.objects.for_feed()
     page = paginator(request, posts)
     context = {
         'page_obj': page,
@@ -26,11 +93,22 @@ def index(request):
     return render(request, 'posts/index.html', context)
 
 
+@conditional_page(
+    listing_validators(lambda slug: GROUP_LISTING.format(slug))
+)
+@cache_anonymous_page(
+    'group_list', lambda slug: GROUP_LISTING.format(slug)
+)
 def group_posts(request, slug):
     """Страница постов определённой группы."""
 
-    group = get_object_or_404(Group, slug=slug)
-    posts = Post.objects.filter(group=group)[:10]
+    # Версию ленты уже прочитал conditional_page, запроса она не стоит.
+    group = group_header(
+        slug, listing_version(GROUP_LISTING.format(slug), request)
+    )
+    if group is None:
+        raise Http404
+    posts = Post.objects.for_feed().filter(group_id=group.id)
     page = paginator(request, posts)
     context = {
         "group": group,
@@ -39,38 +117,116 @@ def group_posts(request, slug):
     return render(request, "posts/group_list.html", context)
 
 
+@conditional_page(profile_validators)
+@cache_anonymous_page(
+    'profile', lambda username: PROFILE_LISTING.format(username)
+)
 def profile(request, username):
     """Страница профиля пользователя проекта yatube."""
 
-    user = get_object_or_404(User, username=username)
-    post_list = Post.objects.filter(author=user)
-    posts_count = post_list.count()
+    user = get_object_or_404(
+        User.objects.select_related('post_stats'), username=username
+    )
+    post_list = Post.objects.for_feed().filter(author=user)
+    posts_count = AuthorStats.posts_count_of(user)
     page = paginator(request, post_list)
+    following = (
+        request.user.is_authenticated
+        and Follow.objects.filter(user=request.user, author=user).exists()
+    )
     context = {
         "author": user,
         "page_obj": page,
         "posts_count": posts_count,
+        "following": following,
     }
     return render(request, "posts/profile.html", context)
 
 
+def groups_index(request):
+    """Каталог групп по активности за окно или по числу постов."""
+
+    sort = request.GET.get('sort')
+    if sort not in sorts():
+        sort = settings.GROUP_RANKING_DEFAULT
+    page = Paginator(ranked_groups(sort), GROUPS_LIMIT).get_page(
+        request.GET.get('page')
+    )
+    context = {
+        'page_obj': page,
+        'sort': sort,
+        'sorts': sorts(),
+        'sort_title': sorts()[sort],
+        'extra_query': '&' + urlencode({'sort': sort}),
+    }
+    return render(request, 'posts/groups.html', context)
+
+
+def search(request):
+    """Полнотекстовый поиск по постам."""
+
+    query = request.GET.get('q', '').strip()
+    page = None
+    if query:
+        page = Paginator(SearchResults(query), SELECT_LIMIT).get_page(
+            request.GET.get('page')
+        )
+    context = {
+        'query': query,
+        'page_obj': page,
+        'extra_query': '&' + urlencode({'q': query}),
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@conditional_page(post_detail_validators)
 def post_detail(request, post_id):
     """Страница с описанием поста."""
 
-    user_post = get_object_or_404(Post, id=post_id)
-    post_count = user_post.author.posts.count()
+    user_post = get_object_or_404(
+        Post.objects.select_related('author__post_stats', 'group'),
+        id=post_id
+    )
+    post_count = AuthorStats.posts_count_of(user_post.author)
     form = CommentForm(request.POST or None)
-    comments = Comment.objects.filter(post__id=post_id)
     context = {
         'post_count': post_count,
         'user_post': user_post,
         'form': form,
-        'comments': comments,
+        'comments': comments_page(request, post_id),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def comments_paginator(post_id):
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author'
+    )
+    return CursorPaginator(comments, COMMENTS_LIMIT, keys=('created', 'id'))
+
+
+def comments_page(request, post_id):
+    return comments_paginator(post_id).cursor_page(request.GET.get('cursor'))
+
+
+def post_comments(request, post_id):
+    """Следующая порция комментариев поста (фрагмент для подгрузки)."""
+
+    get_object_or_404(Post.objects.only('id'), id=post_id)
+    paginator = comments_paginator(post_id)
+    cursor = request.GET.get('cursor')
+    # Без курсора продолжения нет: первая страница уже на странице поста.
+    if not cursor or paginator.decode_cursor(cursor) is None:
+        return HttpResponseBadRequest('Неверный курсор')
+    context = {
+        'post_id': post_id,
+        'comments': paginator.cursor_page(cursor, restart=False),
+    }
+    return render(request, 'includes/comments.html', context)
+
+
 @login_required
+@ratelimit('post_create')
 def post_create(request):
     """Страница создания поста."""
 
@@ -81,7 +237,9 @@ def post_create(request):
     if request.method == "POST" and form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
-        post.save()
+        with write_lock():
+            post.save()
+        schedule_thumbnail(post)
         return redirect("posts:profile", username=request.user)
     form = PostForm()
     return render(request, "posts/create_post.html",
@@ -107,7 +265,11 @@ def post_edit(request, post_id):
         form.text = form.cleaned_data['text']
         form.group = form.cleaned_data['group']
         form.author = request.user
-        form.save()
+        if 'image' in form.changed_data:
+            post.image_thumbnail = ''
+        with write_lock():
+            post = form.save()
+        schedule_thumbnail(post)
         return redirect("posts:post_detail",
                         post_id=post_id)
     return render(request,
@@ -119,6 +281,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@ratelimit('add_comment')
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
@@ -126,5 +289,40 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with write_lock():
+            comment.save()
     return redirect('posts:post_detail', post_id=post_id)
+
+
+@login_required
+def follow_index(request):
+    """Лента постов авторов, на которых подписан пользователь."""
+
+    page = timeline_page(
+        request.user, SELECT_LIMIT, request.GET.get('cursor')
+    )
+    context = {
+        'page_obj': page,
+    }
+    return render(request, 'posts/follow.html', context)
+
+
+@login_required
+def profile_follow(request, username):
+    author = get_object_or_404(User, username=username)
+    if author != request.user:
+        with write_lock():
+            Follow.objects.get_or_create(user=request.user, author=author)
+    return redirect('posts:profile', username=username)
+
+
+@login_required
+def profile_unfollow(request, username):
+    author = get_object_or_404(User, username=username)
+    # delete() по одной записи, чтобы сработали сигналы подписки.
+    with write_lock():
+        for follow in Follow.objects.filter(
+            user=request.user, author=author
+        ):
+            follow.delete()
+    return redirect('posts:profile', username=username)
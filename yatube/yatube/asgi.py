@@ -0,0 +1,27 @@
+"""
+ASGI config for yatube project.
+
+Django 2.2 не умеет ASGI и асинхронные представления, поэтому
+WSGI-приложение оборачивается в ``asgiref.wsgi.WsgiToAsgi``: цикл событий
+сервера принимает соединения, а каждый запрос выполняется в пуле потоков
+asgiref и не блокирует цикл. Запуск::
+
+    pip install asgiref uvicorn
+    uvicorn yatube.asgi:application
+"""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.wsgi import get_wsgi_application
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+except ImportError as error:
+    raise ImproperlyConfigured(
+        'Для запуска через ASGI установите asgiref: pip install asgiref'
+    ) from error
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+application = WsgiToAsgi(get_wsgi_application())
@@ -16,6 +16,8 @@ import os
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+# Не jinja2/: каталог в BASE_DIR заслонил бы пакет jinja2 при импорте.
+JINJA2_TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates_jinja2')
 
 
 # Quick-start development settings - unsuitable for production
@@ -61,22 +63,33 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
 
+# Скомпилированные шаблоны держит в памяти cached.Loader, в том числе
+# при DEBUG: правка шаблона видна после перезапуска сервера.
+TEMPLATE_LOADERS = [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]
+
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates с замером времени рендеринга для Server-Timing.
+        'BACKEND': 'core.metrics.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -85,10 +98,29 @@ TEMPLATES = [
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year'
             ],
+            'loaders': TEMPLATE_LOADERS,
         },
     },
 ]
 
+# Необязательный Jinja2 (нужен пакет jinja2) для templates_jinja2/:
+# base.html, includes/* и posts/*. Остальные рендерит DjangoTemplates.
+JINJA2_TEMPLATES = {
+    'BACKEND': 'core.jinja2_env.TimedJinja2',
+    'DIRS': [JINJA2_TEMPLATES_DIR],
+    'OPTIONS': {
+        'environment': 'core.jinja2_env.environment',
+        'context_processors': [
+            'django.template.context_processors.request',
+            'django.contrib.auth.context_processors.auth',
+            'django.contrib.messages.context_processors.messages',
+            'core.context_processors.year.year'
+        ],
+    },
+}
+if os.environ.get('YATUBE_JINJA2'):
+    TEMPLATES.insert(0, JINJA2_TEMPLATES)
+
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 
@@ -99,9 +131,122 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 60,
     }
 }
 
+# PRAGMA для каждого нового соединения SQLite (core.sqlite).
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 64 * 1024 * 1024,
+    'busy_timeout': 5000,
+}
+# Записи одного процесса выполняются по очереди (core.sqlite.write_lock).
+SQLITE_SERIALIZE_WRITES = True
+
+# Реплики только для чтения: пути к файлам SQLite через запятую, например
+# YATUBE_DB_REPLICAS=replica.sqlite3 (копия db.sqlite3 для проверки).
+# В тестах реплики смотрят в тестовую базу default.
+DATABASE_REPLICAS = []
+for number, name in enumerate(
+    filter(None, os.environ.get('YATUBE_DB_REPLICAS', '').split(',')), 1
+):
+    alias = f'replica_{number}'
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, name),
+        'CONN_MAX_AGE': 60,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+# Страницы, которые читают с реплик, и окно после записи, когда
+# посетитель читает из default (core.middleware.ReplicaRoutingMiddleware).
+REPLICA_VIEWS = {
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:post_comments',
+    'posts:search',
+    'posts:groups_index',
+    'about:author',
+    'about:tech',
+}
+REPLICA_PIN_COOKIE = 'primary_pin'
+REPLICA_PIN_SECONDS = 10
+
+
+# Cache
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+
+# LocMemCache вытесняет давно не читанные ключи (LRU), когда записей
+# больше MAX_ENTRIES, и удаляет просроченные по TIMEOUT.
+POST_CARD_CACHE = 'post_cards'
+POST_CARD_CACHE_TIMEOUT = 60 * 60
+POST_CARD_CACHE_MAX_ENTRIES = 5000
+
+# Шапки групп (posts.cache.group_header). Сигналы обновляют шапку только
+# в кеше своего процесса, другим процессам с LocMemCache правка видна
+# через GROUP_HEADER_CACHE_TIMEOUT секунд.
+GROUP_HEADER_CACHE = 'default'
+GROUP_HEADER_CACHE_TIMEOUT = 60
+
+# Страницы лент целиком для анонимных посетителей, время жизни в секундах.
+PAGE_CACHE = 'pages'
+PAGE_CACHE_TIMEOUTS = {
+    'index': 20,
+    'group_list': 60,
+    'profile': 60,
+}
+
+# Корзины токенов ограничения частоты записей (core.ratelimit).
+# None — корзины в памяти процесса.
+RATELIMIT_CACHE = 'ratelimit'
+RATELIMIT_ENABLED = True
+RATELIMIT_VIEW = 'core.views.too_many_requests'
+# Адреса своих обратных прокси: только от них берётся X-Forwarded-For.
+RATELIMIT_TRUSTED_PROXIES = ()
+# Ёмкость корзины / время её наполнения: s, m, h или d.
+RATELIMITS = {
+    'post_create': {'user': '20/h', 'ip': '60/h'},
+    'add_comment': {'user': '10/m', 'ip': '60/m'},
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Таблица в общей базе: лимит один на все процессы сервера.
+    # Создаётся командой createcachetable.
+    RATELIMIT_CACHE: {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'ratelimit_cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    PAGE_CACHE: {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'pages',
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+        },
+    },
+    POST_CARD_CACHE: {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'post_cards',
+        'TIMEOUT': POST_CARD_CACHE_TIMEOUT,
+        'OPTIONS': {
+            'MAX_ENTRIES': POST_CARD_CACHE_MAX_ENTRIES,
+            'CULL_FREQUENCY': 10,
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -142,4 +287,68 @@ USE_TZ = True
 STATIC_URL = '/static/'
 
 MEDIA_URL = '/media/'
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
\ No newline at end of file
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Загрузки хранятся по хэшу содержимого (core.storage), сами файлы —
+# во внутреннем хранилище CONTENT_STORAGE.
+DEFAULT_FILE_STORAGE = 'core.storage.ContentAddressedStorage'
+CONTENT_STORAGE = {
+    # S3-совместимое хранилище через django-storages:
+    # 'BACKEND': 'storages.backends.s3boto3.S3Boto3Storage',
+    'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    'OPTIONS': {},
+}
+
+# Миниатюры картинок постов считаются в пуле потоков после коммита.
+THUMBNAIL_ASYNC = True
+THUMBNAIL_WORKERS = 2
+
+# Лента подписок: посты авторов, у которых подписчиков больше лимита,
+# не раскладываются при публикации, а подтягиваются при чтении ленты.
+TIMELINE_FANOUT_LIMIT = 1000
+TIMELINE_BACKFILL = 200
+TIMELINE_BATCH_SIZE = 1000
+# Посты таких авторов подтягиваются не чаще раза в TIMELINE_PULL_INTERVAL
+# секунд на подписчика, с перекрытием TIMELINE_PULL_OVERLAP секунд.
+TIMELINE_PULL_INTERVAL = 30
+TIMELINE_PULL_OVERLAP = 60
+
+# Массовые действия модерации в админке: id постов и комментариев
+# на одну транзакцию UPDATE/DELETE (posts.moderation).
+MODERATION_BATCH_SIZE = 500
+
+# Окна мест групп в каталоге, в днях (manage.py compute_group_rankings).
+GROUP_RANKING_WINDOWS = {
+    'day': 1,
+    'week': 7,
+    'month': 30,
+}
+GROUP_RANKING_DEFAULT = 'week'
+
+# Замеры запросов (core.middleware.PerformanceMiddleware): заголовок
+# строка в логе yatube.performance для доли запросов, а при DEBUG или
+# для персонала ещё и заголовок Server-Timing. По умолчанию выключены:
+# замер каждого SQL-запроса стоит времени.
+PERF_METRICS_ENABLED = False
+PERF_SAMPLE_RATE = 0.1
+PERF_SLOW_REQUEST_MS = 500
+PERF_SLOW_QUERIES_LOGGED = 50
+
+# Медленные запросы пишутся всегда, строки по каждому запросу —
+# при PERF_LOG_LEVEL=INFO.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'yatube.performance': {
+            'handlers': ['console'],
+            'level': os.environ.get('PERF_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
+}